@@ -29,9 +29,14 @@ send_notification() {
 
 # Trap function to ensure graceful shutdown
 graceful_shutdown() {
-  echo "Stopping the model loader..."
-  kill $MODEL_LOADER_PID
-  send_notification "Model loader stopped."
+  # Only stop the model loader if this script started it
+  if [ -n "$MODEL_LOADER_PID" ]; then
+    echo "Stopping the model loader..."
+    kill $MODEL_LOADER_PID
+    # Give it time to save the memory turns it still has queued
+    wait $MODEL_LOADER_PID
+    send_notification "Model loader stopped."
+  fi
   echo "Script execution completed."
   exit
 }
@@ -41,16 +46,31 @@ trap graceful_shutdown SIGINT SIGTERM
 # Log start time
 START_TIME=$(date +%s)
 
-# Load the model (assuming model_loader.py runs in the background and keeps the model in memory)
-echo "Loading the model..."
-python /home/ncacord/qRaphael/scripts/model_loader.py &
+# The model is served by a long-lived inference server (model_loader.py);
+# generate_text.py is only a client that talks to it over a Unix socket.
+INFERENCE_SOCKET=${INFERENCE_SOCKET:-/home/ncacord/qRaphael/run/inference.sock}
+export INFERENCE_SOCKET
+
+# A server answering a ping has its model loaded; a leftover socket file
+# from a crashed server does not count
+if python /home/ncacord/qRaphael/scripts/inference_client.py --wait 0; then
+  echo "Inference server already running at $INFERENCE_SOCKET."
+else
+  echo "Loading the model..."
+  python /home/ncacord/qRaphael/scripts/model_loader.py &
 
-# Capture the PID of the background model loader script
-MODEL_LOADER_PID=$!
+  # Capture the PID of the background model loader script
+  MODEL_LOADER_PID=$!
 
-# Wait for a few seconds to ensure the model is loaded (configurable via .env)
-MODEL_LOAD_WAIT_TIME=${MODEL_LOAD_WAIT_TIME:-5}
-sleep $MODEL_LOAD_WAIT_TIME
+  # Wait until the server is ready, giving up after MODEL_LOAD_TIMEOUT
+  # seconds or as soon as the loader exits (configurable via .env)
+  MODEL_LOAD_TIMEOUT=${MODEL_LOAD_TIMEOUT:-300}
+  if ! python /home/ncacord/qRaphael/scripts/inference_client.py --wait "$MODEL_LOAD_TIMEOUT" --pid "$MODEL_LOADER_PID"; then
+    echo "The model loader did not become ready."
+    send_notification "Model loader failed to start."
+    graceful_shutdown
+  fi
+fi
 
 # Log system metrics before running the text generation script
 log_system_metrics
@@ -72,7 +92,7 @@ fi
 # Run the text generation script
 if [ "$LOOP_MODE" = true ]; then
     echo "Running the text generation script in loop mode..."
-    python /home/ncacord/qRaphael/scripts/generate_text.py --user_id "$USER_ID" --log_level INFO --loop
+    python /home/ncacord/qRaphael/scripts/generate_text.py --user_id "$USER_ID" --log_level INFO --loop --stream
 else
     echo "Running the text generation script..."
     python /home/ncacord/qRaphael/scripts/generate_text.py --prompt "$PROMPT" --user_id "$USER_ID" --max_length 50 --log_level INFO
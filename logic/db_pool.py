@@ -0,0 +1,173 @@
+# logic/db_pool.py
+
+# Description: Process-wide pool of reusable PostgreSQL connections.
+
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions, pool
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections. Borrowing blocks while all
+    connections are in use, connections are health checked before reuse and
+    broken or expired connections are replaced instead of handed out again.
+
+    Args:
+    - connect (callable): Opens a new psycopg2 connection.
+    - min_size (int): Connections opened up front and kept while idle.
+    - max_size (int): Upper bound on open connections.
+    - max_age (float): Seconds after which a connection is recycled.
+    - check_interval (float): Idle seconds after which a connection is pinged
+      before it is handed out again.
+    - timeout (float): Seconds to wait for a free connection, or None to wait
+      forever.
+    """
+
+    def __init__(
+        self, connect, min_size=1, max_size=10, max_age=1800, check_interval=30, timeout=30
+    ):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self.idle = []
+        self.created_at = {}
+        self.last_used = {}
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+        for _ in range(min_size):
+            conn = self.open()
+            self.idle.append(conn)
+
+    def open(self):
+        conn = self.connect()
+        self.created_at[id(conn)] = self.last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def discard(self, conn):
+        self.created_at.pop(id(conn), None)
+        self.last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def is_healthy(self, conn):
+        now = time.monotonic()
+        if conn.closed or now - self.created_at[id(conn)] > self.max_age:
+            return False
+        if now - self.last_used[id(conn)] > self.check_interval:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f"Discarding broken database connection: {e}")
+                return False
+        return True
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise pool.PoolError(
+                f"No database connection became free within {self.timeout} seconds"
+            )
+        try:
+            while True:
+                with self.lock:
+                    conn = self.idle.pop() if self.idle else None
+                if conn is None:
+                    return self.open()
+                if self.is_healthy(conn):
+                    return conn
+                self.discard(conn)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn, broken=False):
+        try:
+            if not broken and not conn.closed:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    broken = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+        except psycopg2.Error:
+            broken = True
+        if broken or conn.closed:
+            self.discard(conn)
+        else:
+            self.last_used[id(conn)] = time.monotonic()
+            with self.lock:
+                self.idle.append(conn)
+        self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with block. Connections that
+        fail with an operational error are closed rather than returned.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            self.discard(conn)
+
+
+def uses_connection(get_pool):
+    """
+    Decorator factory for functions taking a `conn` argument. When the caller
+    does not pass a connection, one is borrowed from the pool returned by
+    get_pool for the duration of the call.
+
+    Args:
+    - get_pool (callable): Returns the ConnectionPool to borrow from.
+
+    Returns:
+    - callable: The decorator.
+    """
+
+    def decorator(func):
+        conn_index = list(inspect.signature(func).parameters).index("conn")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if len(args) > conn_index:
+                if args[conn_index] is not None:
+                    return func(*args, **kwargs)
+                with get_pool().connection() as conn:
+                    return func(
+                        *args[:conn_index], conn, *args[conn_index + 1 :], **kwargs
+                    )
+            if kwargs.get("conn") is not None:
+                return func(*args, **kwargs)
+            with get_pool().connection() as conn:
+                kwargs["conn"] = conn
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,55 @@
+# logic/intent_router.py
+
+# Description: Recognizes what kind of request a prompt is, from a table of
+# precompiled patterns per intent.
+
+import re
+from logic.utils import load_config
+
+
+class IntentRouter:
+    """
+    Matches prompts against regular expressions per intent. Patterns are
+    compiled once, case-insensitively, and tried in the order they are given;
+    named groups in a pattern are passed on as the intent's fields.
+
+    Args:
+    - intents (dict): Lists of patterns keyed by intent name.
+    """
+
+    def __init__(self, intents):
+        self.patterns = [
+            (intent, re.compile(pattern, re.IGNORECASE))
+            for intent, patterns in intents.items()
+            for pattern in patterns
+        ]
+
+    def match(self, prompt):
+        """
+        Find the intent of a prompt.
+
+        Args:
+        - prompt (str): The prompt provided by the user.
+
+        Returns:
+        - tuple: (intent, fields) for the first matching pattern, or None when
+          the prompt should go to the model.
+        """
+        for intent, pattern in self.patterns:
+            match = pattern.search(prompt)
+            if match:
+                return intent, match.groupdict()
+        return None
+
+
+def load_intent_router(config_file):
+    """
+    Build an IntentRouter from the patterns in a configuration file.
+
+    Args:
+    - config_file (str): Path to the intent configuration.
+
+    Returns:
+    - IntentRouter: The router.
+    """
+    return IntentRouter(load_config(config_file))
@@ -0,0 +1,86 @@
+# logic/keyword_matcher.py
+
+# Description: Aho-Corasick matcher for finding which of many keywords occur
+# in a text with a single pass over the text.
+
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Finds the highest priority keyword occurring anywhere in a text, in time
+    linear in the text length however many keywords there are. A keyword's
+    priority is its position in the list it was built from, so the result is
+    the same as checking `keyword in text` for each keyword in order.
+
+    Args:
+    - keywords (list): The keywords, highest priority first.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        # State 0 is the root. goto[state] maps a character to the next state.
+        self.goto = [{}]
+        # Best (lowest) keyword index ending at each state, including the
+        # keywords that are suffixes of the state's text; None when none do
+        self.best = [None]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.best.append(None)
+                    self.goto[state][char] = next_state
+                state = next_state
+            if self.best[state] is None or index < self.best[state]:
+                self.best[state] = index
+        self.fail = [0] * len(self.goto)
+        self.build_failure_links()
+
+    def build_failure_links(self):
+        # Breadth first, so a state's failure target is final before its
+        # children are processed
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (
+                    self.best[child] is None or inherited < self.best[child]
+                ):
+                    self.best[child] = inherited
+                pending.append(child)
+
+    def first(self, text):
+        """
+        Find the highest priority keyword occurring in a text.
+
+        Args:
+        - text (str): The text to search.
+
+        Returns:
+        - int: Index of the keyword, or None when no keyword occurs.
+        """
+        goto = self.goto
+        fail = self.fail
+        best = self.best
+        # An empty keyword occurs in every text
+        found = best[0]
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = best[state]
+            if match is not None and (found is None or match < found):
+                found = match
+                if found == 0:
+                    break
+        return found
@@ -0,0 +1,128 @@
+# logic/memory_compaction.py
+
+# Description: Rolls old user_memory rows up into a per-user summary so
+# long-term context survives without growing the prompt. Runs off the
+# request path, either in a background thread of the inference server or as
+# a batch job.
+
+import logging
+import threading
+from logic.model_memory_logic import (
+    fetch_compaction_candidates,
+    fetch_memory_summary,
+    fetch_turns_to_compact,
+    save_memory_summary,
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and their assistant "
+    "Raphael. Keep facts about the user, their plans and anything they asked "
+    "to be remembered. Write at most a few sentences.\n\n"
+    "Previous summary:\n{summary}\n\nConversation:\n{turns}\n\nSummary:"
+)
+
+
+def summary_config(config):
+    """
+    Derive the generation parameters used for summaries: greedy decoding
+    with their own length limit, not cut short at the reply target length.
+
+    Args:
+    - config (dict): The text generation parameters.
+
+    Returns:
+    - dict: The parameters for summary generation.
+    """
+    return dict(
+        config,
+        do_sample=False,
+        max_new_tokens=config["summary_max_new_tokens"],
+        target_new_tokens=None,
+    )
+
+
+def compact_user_memory(user_id, summarize, keep_turns, batch_turns):
+    """
+    Fold the user's oldest unsummarized turns into their summary.
+
+    Args:
+    - user_id (str): Unique identifier for the user.
+    - summarize (callable): Takes a prompt and returns the generated summary.
+    - keep_turns (int): Most recent turns left out because they are still
+      part of the memory window.
+    - batch_turns (int): Maximum turns folded in per call.
+
+    Returns:
+    - int: The number of turns that were summarized.
+    """
+    rows = fetch_turns_to_compact(user_id, keep_turns, batch_turns)
+    if not rows:
+        return 0
+    prompt = SUMMARY_PROMPT.format(
+        summary=fetch_memory_summary(user_id) or "(none)",
+        turns="\n".join(row[0] for row in rows),
+    )
+    summary = summarize(prompt).strip()
+    if summary:
+        # The highest memory_id summarized, not its timestamp, which it may
+        # share with rows that were not
+        save_memory_summary(user_id, summary, rows[-1][1])
+    return len(rows)
+
+
+def compact_all_users(summarize, keep_turns, batch_turns):
+    """
+    Run one compaction pass over every user with enough old turns.
+
+    Args:
+    - summarize (callable): Takes a prompt and returns the generated summary.
+    - keep_turns (int): Most recent turns left out of the summary.
+    - batch_turns (int): Old turns needed before a user is compacted, and the
+      maximum folded in per pass.
+
+    Returns:
+    - int: The number of turns that were summarized.
+    """
+    compacted = 0
+    for user_id in fetch_compaction_candidates(keep_turns + batch_turns):
+        try:
+            compacted += compact_user_memory(user_id, summarize, keep_turns, batch_turns)
+        except Exception as e:
+            logger.error(f"Error compacting memory for user {user_id}: {e}")
+    return compacted
+
+
+class MemoryCompactor(threading.Thread):
+    """
+    Background thread running compact_all_users every `interval` seconds.
+
+    Args:
+    - summarize (callable): Takes a prompt and returns the generated summary.
+    - keep_turns (int): Most recent turns left out of the summary.
+    - batch_turns (int): Old turns needed before a user is compacted.
+    - interval (float): Seconds between compaction passes.
+    """
+
+    def __init__(self, summarize, keep_turns, batch_turns, interval):
+        super().__init__(name="memory-compactor", daemon=True)
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.batch_turns = batch_turns
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                compacted = compact_all_users(
+                    self.summarize, self.keep_turns, self.batch_turns
+                )
+                if compacted:
+                    logger.info(f"Compacted {compacted} memory turns")
+            except Exception as e:
+                logger.error(f"Memory compaction pass failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
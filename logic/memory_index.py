@@ -0,0 +1,209 @@
+# logic/memory_index.py
+
+# Description: Per-user vector index over memory turns, so the turns most
+# relevant to a prompt can be recalled without reading the whole history.
+
+import fcntl
+import hashlib
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+from logic.section_router import WORD_PATTERN, normalize_word
+
+
+def embed_text(text, dim):
+    """
+    Embed text with the hashing trick: every normalized word is hashed to one
+    of `dim` buckets with a hashed sign, weighted by log term frequency. The
+    hash is stable across processes, so stored vectors stay valid.
+
+    Args:
+    - text (str): The text to embed.
+    - dim (int): Number of dimensions.
+
+    Returns:
+    - numpy.ndarray: The L2-normalized float32 vector.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    counts = Counter(normalize_word(word) for word in WORD_PATTERN.findall(text.lower()))
+    for word, count in counts.items():
+        digest = zlib.crc32(word.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % dim] += sign * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class UserVectors:
+    """
+    The vectors of one user's memory turns with their memory ids, in a
+    buffer that grows by doubling so appends are amortized O(1).
+
+    Args:
+    - dim (int): Embedding dimensions.
+    """
+
+    def __init__(self, dim):
+        self.count = 0
+        self.ids = np.zeros(16, dtype=np.int64)
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.known = set()
+        # Rows of the index files read so far
+        self.file_rows = 0
+
+    def append(self, memory_id, vector):
+        # Files written before duplicates were checked on disk may repeat ids
+        if int(memory_id) in self.known:
+            return
+        if self.count == len(self.ids):
+            self.ids = np.resize(self.ids, 2 * len(self.ids))
+            self.vectors = np.resize(self.vectors, (2 * len(self.vectors), self.vectors.shape[1]))
+        self.ids[self.count] = memory_id
+        self.vectors[self.count] = vector
+        self.known.add(int(memory_id))
+        self.count += 1
+
+    def last_id(self):
+        return int(self.ids[: self.count].max()) if self.count else 0
+
+
+class MemoryIndex:
+    """
+    Brute-force cosine search over each user's memory turns. Every user's
+    vectors and ids are kept in two append-only files under `index_dir`, so
+    adding a turn writes a single row and the index survives restarts.
+    Several processes (the pre-fork workers) may share the files: rows other
+    processes appended are read before every lookup, and appends hold an
+    exclusive lock and check for duplicates against the files themselves.
+
+    Args:
+    - index_dir (str): Directory holding the index files.
+    - dim (int): Embedding dimensions.
+    """
+
+    def __init__(self, index_dir, dim=512):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.users = {}
+        self.lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+
+    def paths(self, user_id):
+        name = hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()
+        base = os.path.join(self.index_dir, name)
+        return base + ".ids", base + ".vec"
+
+    def load(self, user_id):
+        # Called with the lock held. Reads the rows appended to the files
+        # since the last call, by this or any other process.
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserVectors(self.dim)
+        ids_path, vec_path = self.paths(user_id)
+        try:
+            ids_size = os.path.getsize(ids_path)
+            vec_size = os.path.getsize(vec_path)
+        except FileNotFoundError:
+            return user
+        # A write in progress or interrupted half way leaves a partial last
+        # row, which is not read
+        rows = min(ids_size // 8, vec_size // (4 * self.dim))
+        if rows > user.file_rows:
+            new_rows = rows - user.file_rows
+            ids = np.fromfile(
+                ids_path, dtype=np.int64, count=new_rows, offset=user.file_rows * 8
+            )
+            vectors = np.fromfile(
+                vec_path,
+                dtype=np.float32,
+                count=new_rows * self.dim,
+                offset=user.file_rows * 4 * self.dim,
+            ).reshape(new_rows, self.dim)
+            for memory_id, vector in zip(ids, vectors):
+                user.append(memory_id, vector)
+            user.file_rows = rows
+        return user
+
+    def last_id(self, user_id):
+        """
+        Highest memory id indexed for the user, 0 when nothing is indexed.
+        Rows saved after it can be passed to add_many() to catch up.
+        """
+        with self.lock:
+            return self.load(user_id).last_id()
+
+    def add(self, user_id, memory_id, text):
+        self.add_many(user_id, [(memory_id, text)])
+
+    def add_many(self, user_id, rows):
+        """
+        Index memory turns. Turns that are indexed already are skipped.
+
+        Args:
+        - user_id (str): Unique identifier for the user.
+        - rows (iterable): (memory_id, memory_text) pairs.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        vectors = np.stack([embed_text(text, self.dim) for _, text in rows])
+        ids = np.array([memory_id for memory_id, _ in rows], dtype=np.int64)
+        ids_path, vec_path = self.paths(user_id)
+        with self.lock, open(vec_path, "ab") as vec_file, open(ids_path, "ab") as ids_file:
+            # Other processes append to the same files, so the check for
+            # known ids and the two writes happen under one exclusive lock
+            fcntl.flock(ids_file, fcntl.LOCK_EX)
+            try:
+                user = self.load(user_id)
+                new = np.array([int(i) not in user.known for i in ids], dtype=bool)
+                # The same id twice within rows is indexed once
+                _, first = np.unique(ids, return_index=True)
+                new &= np.isin(np.arange(len(ids)), first)
+                if not new.any():
+                    return
+                ids, vectors = ids[new], vectors[new]
+                # Drop a partial row an interrupted write left behind, so the
+                # two files stay aligned
+                vec_file.truncate(user.file_rows * 4 * self.dim)
+                ids_file.truncate(user.file_rows * 8)
+                vec_file.write(vectors.tobytes())
+                vec_file.flush()
+                ids_file.write(ids.tobytes())
+                ids_file.flush()
+                for memory_id, vector in zip(ids, vectors):
+                    user.append(memory_id, vector)
+                user.file_rows += len(ids)
+            finally:
+                fcntl.flock(ids_file, fcntl.LOCK_UN)
+
+    def search(self, user_id, text, k):
+        """
+        Find the memory turns most similar to a text.
+
+        Args:
+        - user_id (str): Unique identifier for the user.
+        - text (str): The text to match, usually the prompt.
+        - k (int): Maximum number of results.
+
+        Returns:
+        - list: Memory ids of the matching turns, best match first. Turns
+          sharing no words with the text are left out.
+        """
+        query = embed_text(text, self.dim)
+        with self.lock:
+            user = self.load(user_id)
+            count = user.count
+            if count == 0 or k <= 0:
+                return []
+            scores = user.vectors[:count] @ query
+            ids = user.ids[:count].copy()
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Ids are unique per user, but never return a turn twice
+        return list(dict.fromkeys(int(ids[i]) for i in top if scores[i] > 0))
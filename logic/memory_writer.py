@@ -0,0 +1,130 @@
+# logic/memory_writer.py
+
+# Description: Write-behind queue for user_memory rows. Replies no longer
+# wait for the insert and commit; a background thread saves the queued rows
+# in batches instead.
+
+import logging
+import queue
+import threading
+import time
+import psycopg2
+import psycopg2.pool
+from logic.metrics import metrics
+from logic.model_memory_logic import save_user_memories
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: lost connections and an exhausted pool
+TRANSIENT_ERRORS = (
+    psycopg2.OperationalError,
+    psycopg2.InterfaceError,
+    psycopg2.pool.PoolError,
+)
+
+STOP = object()
+
+
+class MemoryWriter(threading.Thread):
+    """
+    Background thread saving memory rows in batches. submit() blocks while
+    the queue is full, so a stalled database slows replies down instead of
+    growing the queue without bound. Batches failing with a connection error
+    or an exhausted pool are retried with exponential backoff, and a batch
+    failing otherwise is saved again row by row, so only the bad row is lost.
+    stop() saves whatever is still queued before the thread exits.
+
+    Args:
+    - max_queue (int): Maximum rows waiting to be saved.
+    - batch_size (int): Maximum rows saved in one statement.
+    - max_retries (int): Attempts after the first for a failing batch.
+    - retry_delay (float): Seconds before the first retry.
+    """
+
+    def __init__(self, max_queue=1000, batch_size=64, max_retries=5, retry_delay=0.5):
+        super().__init__(name="memory-writer", daemon=True)
+        self.rows = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def submit(self, user_id, memory_text, on_saved=None):
+        """
+        Queue a memory row.
+
+        Args:
+        - user_id (str): Unique identifier for the user.
+        - memory_text (str): The turn to remember.
+        - on_saved (callable): Called with the new memory_id once the row is
+          saved, on the writer thread.
+        """
+        self.rows.put((user_id, memory_text, on_saved))
+
+    def stop(self, timeout=None):
+        """
+        Save the queued rows and stop the thread.
+
+        Args:
+        - timeout (float): Seconds to wait for the queue to drain, or None to
+          wait until it has.
+        """
+        self.rows.put(STOP)
+        self.join(timeout)
+
+    def run(self):
+        stopping = False
+        while True:
+            # Wait for the first row, then take whatever else is waiting up
+            # to a batch. Once stopping, only drain what is left.
+            batch = []
+            block = not stopping
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.rows.get(block=block)
+                except queue.Empty:
+                    break
+                block = False
+                if item is STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if batch:
+                self.save(batch)
+            elif stopping:
+                return
+
+    def save(self, batch):
+        rows = [(user_id, memory_text) for user_id, memory_text, _ in batch]
+        try:
+            memory_ids = self.save_with_retries(rows)
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Dropping {len(rows)} memory rows after {self.max_retries + 1} attempts: {e}")
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Dropping memory row of user {rows[0][0]}: {e}")
+                return
+            # A batch can hold rows of several users, so one bad row must not
+            # take the others with it
+            logger.warning(f"Saving {len(rows)} memory rows failed, saving them one by one: {e}")
+            for item in batch:
+                self.save([item])
+            return
+        for (_, _, on_saved), memory_id in zip(batch, memory_ids):
+            if on_saved is not None:
+                try:
+                    on_saved(memory_id)
+                except Exception as e:
+                    logger.error(f"Memory row {memory_id} callback failed: {e}")
+
+    def save_with_retries(self, rows):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.span("memory_save"):
+                    return save_user_memories(rows)
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * 2**attempt
+                logger.warning(f"Saving memory rows failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
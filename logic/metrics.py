@@ -0,0 +1,201 @@
+# logic/metrics.py
+
+# Description: Latency histograms for the stages of a request, exported as
+# JSON or in the Prometheus text format by the inference server.
+
+import contextlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRIC_NAME = "qraphael_stage_seconds"
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, plus their sum and count.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        buckets = []
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class MetricsRegistry:
+    """
+    Histograms keyed by stage and labels, and gauges read from callbacks
+    (e.g. cache statistics) when the metrics are exported. Labels set with
+    set_labels() are added to every exported series, so the series of
+    pre-fork workers answering the same scrape address stay apart.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.labels = {}
+        self.lock = threading.Lock()
+
+    def set_labels(self, **labels):
+        """
+        Set labels added to every exported series, e.g. worker="0".
+        """
+        with self.lock:
+            self.labels = {name: str(value) for name, value in labels.items()}
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Record the duration of a stage.
+
+        Args:
+        - stage (str): Name of the stage, e.g. "tokenize".
+        - seconds (float): How long it took.
+        - labels: Further labels, e.g. query="profile".
+        """
+        key = (stage, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def span(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def register_gauges(self, prefix, callback):
+        """
+        Export the numbers returned by a callback as gauges named
+        <prefix>_<key>.
+
+        Args:
+        - prefix (str): Prefix of the gauge names.
+        - callback (callable): Returns a dict of numbers.
+        """
+        with self.lock:
+            self.gauges[prefix] = callback
+
+    def read_gauges(self):
+        with self.lock:
+            callbacks = list(self.gauges.items())
+        values = {}
+        for prefix, callback in callbacks:
+            for key, value in callback().items():
+                values[f"{prefix}_{key}"] = value
+        return values
+
+    def snapshot(self):
+        """
+        The current metrics as plain data.
+
+        Returns:
+        - dict: "stages" with one entry per stage and labels (count, sum in
+          seconds and cumulative bucket counts), "gauges", and the "labels"
+          of the process.
+        """
+        with self.lock:
+            process_labels = dict(self.labels)
+            stages = [
+                {
+                    "stage": stage,
+                    "labels": dict(process_labels, **dict(labels)),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": [
+                        ["+Inf" if bound == float("inf") else bound, count]
+                        for bound, count in histogram.cumulative()
+                    ],
+                }
+                for (stage, labels), histogram in sorted(self.histograms.items())
+            ]
+        return {"stages": stages, "gauges": self.read_gauges(), "labels": process_labels}
+
+    def prometheus(self):
+        """
+        The current metrics in the Prometheus text exposition format.
+
+        Returns:
+        - str: The metrics.
+        """
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {METRIC_NAME} histogram"]
+        for entry in snapshot["stages"]:
+            labels = dict(entry["labels"], stage=entry["stage"])
+            for bound, count in entry["buckets"]:
+                lines.append(
+                    f"{METRIC_NAME}_bucket{format_labels(dict(labels, le=bound))} {count}"
+                )
+            lines.append(f"{METRIC_NAME}_sum{format_labels(labels)} {entry['sum']}")
+            lines.append(f"{METRIC_NAME}_count{format_labels(labels)} {entry['count']}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE qraphael_{name} gauge")
+            lines.append(f"qraphael_{name}{format_labels(snapshot['labels'])} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+        + "}"
+    )
+
+
+# The process-wide registry
+metrics = MetricsRegistry()
+
+
+class MetricsLogger(threading.Thread):
+    """
+    Background thread writing the metrics to the log every `interval`
+    seconds.
+
+    Args:
+    - registry (MetricsRegistry): The metrics to log.
+    - interval (float): Seconds between log lines.
+    """
+
+    def __init__(self, registry, interval):
+        super().__init__(name="metrics-logger", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            logger.info(f"Metrics: {json.dumps(self.registry.snapshot())}")
+
+    def stop(self):
+        self.stopped.set()
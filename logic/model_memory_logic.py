@@ -1,7 +1,16 @@
+import functools
+import json
 import os
+import threading
+from datetime import date, datetime
+from decimal import Decimal
 import psycopg2
+import psycopg2.extras
 from dotenv import load_dotenv
 import random
+from logic.db_pool import ConnectionPool, uses_connection
+from logic.metrics import metrics
+from logic.profile_cache import MISSING, ProfileCache, cached_section
 
 load_dotenv()
 
@@ -10,6 +19,16 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_AGE = float(os.getenv("DB_POOL_MAX_AGE", "1800"))
+DB_POOL_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "600"))
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
 
 def connect_db():
     conn = psycopg2.connect(
@@ -17,35 +36,220 @@ def connect_db():
     )
     return conn
 
-def fetch_user_memory(user_id, conn):
+# The pool is created on first use. A forked child gets a pool of its own
+# since connections cannot be shared across processes.
+def get_connection_pool():
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None or _connection_pool.pid != os.getpid():
+            _connection_pool = ConnectionPool(
+                connect_db,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_age=DB_POOL_MAX_AGE,
+                check_interval=DB_POOL_CHECK_INTERVAL,
+                timeout=DB_POOL_TIMEOUT,
+            )
+        return _connection_pool
+
+def close_connection_pool():
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is not None and _connection_pool.pid == os.getpid():
+            _connection_pool.close()
+        _connection_pool = None
+
+# Functions taking a connection borrow one from the pool when none is passed
+pooled = uses_connection(get_connection_pool)
+
+# Profile sections rarely change, so they are cached per (user_id, section)
+# and the writers below invalidate what they touch. The cache is created
+# before the pre-fork workers are, so their invalidations reach each other.
+profile_cache = ProfileCache(max_entries=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+def cached(section):
+    return cached_section(profile_cache, section)
+
+metrics.register_gauges("profile_cache", profile_cache.stats)
+
+# Returns the user's memory turns oldest first. With a limit only the most
+# recent turns are read, so the cost does not grow with the user's history.
+# Turns are ordered by memory_id, since rows saved in one batch share their
+# timestamp.
+@pooled
+def fetch_memory_turns(user_id, conn=None, limit=None):
     try:
-        with conn.cursor() as cursor:
+        with conn.cursor() as cursor, metrics.span("db_fetch", query="memory_turns"):
             cursor.execute(
-                "SELECT memory_text FROM user_memory WHERE user_id = %s ORDER BY timestamp",
-                (user_id,),
+                """
+                SELECT memory_text FROM (
+                    SELECT memory_id, memory_text FROM user_memory
+                    WHERE user_id = %s ORDER BY memory_id DESC LIMIT %s
+                ) recent ORDER BY memory_id
+            """,
+                (user_id, limit),
             )
             results = cursor.fetchall()
-            memory = "\n".join([result[0] for result in results])
-            return memory
+            return [result[0] for result in results]
     except Exception as e:
         print(f"Error fetching user memory: {e}")
+        return []
+
+@pooled
+def fetch_memory_summary(user_id, conn=None):
+    try:
+        with conn.cursor() as cursor, metrics.span("db_fetch", query="memory_summary"):
+            cursor.execute(
+                "SELECT summary_text FROM user_memory_summary WHERE user_id = %s",
+                (user_id,),
+            )
+            result = cursor.fetchone()
+            if result:
+                return result[0]
+            else:
+                return ""
+    except Exception as e:
+        print(f"Error fetching memory summary: {e}")
         return ""
 
-def save_user_memory(user_id, user_memory, conn):
+# With a limit the rolling summary of older turns is put in front of the
+# recent ones, so long-term context survives the window
+@pooled
+def fetch_user_memory(user_id, conn=None, limit=None):
+    turns = fetch_memory_turns(user_id, conn, limit)
+    if limit is not None:
+        summary = fetch_memory_summary(user_id, conn)
+        if summary:
+            turns.insert(0, summary)
+    return "\n".join(turns)
+
+# Users with at least min_turns memory rows that are not yet covered by
+# their summary
+@pooled
+def fetch_compaction_candidates(min_turns, conn=None):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT m.user_id FROM user_memory m
+            LEFT JOIN user_memory_summary s ON s.user_id = m.user_id
+            WHERE m.memory_id > COALESCE(s.summarized_until_id, 0)
+            GROUP BY m.user_id HAVING COUNT(*) >= %s
+        """,
+            (min_turns,),
+        )
+        return [result[0] for result in cursor.fetchall()]
+
+# The oldest unsummarized turns, skipping the keep_turns most recent ones
+# which are still part of the memory window. Returns (memory_text, memory_id)
+# rows oldest first. The summary covers rows up to a memory_id rather than a
+# timestamp, because rows saved in one batch share their timestamp and a
+# batch cut by the limit would otherwise be skipped for good.
+@pooled
+def fetch_turns_to_compact(user_id, keep_turns, limit, conn=None):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT memory_text, memory_id FROM (
+                SELECT memory_text, memory_id FROM user_memory
+                WHERE user_id = %s AND memory_id > COALESCE(
+                    (SELECT summarized_until_id FROM user_memory_summary WHERE user_id = %s),
+                    0
+                )
+                ORDER BY memory_id DESC OFFSET %s
+            ) unsummarized ORDER BY memory_id LIMIT %s
+        """,
+            (user_id, user_id, keep_turns, limit),
+        )
+        return cursor.fetchall()
+
+@pooled
+def save_memory_summary(user_id, summary_text, summarized_until_id, conn=None):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO user_memory_summary (user_id, summary_text, summarized_until_id)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    summary_text = EXCLUDED.summary_text,
+                    summarized_until_id = EXCLUDED.summarized_until_id,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (user_id, summary_text, summarized_until_id),
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"Error saving memory summary: {e}")
+
+# Returns the new row's memory_id, or None when saving failed
+@pooled
+def save_user_memory(user_id, user_memory, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
                 INSERT INTO user_memory (user_id, memory_text)
-                VALUES (%s, %s)
+                VALUES (%s, %s) RETURNING memory_id
             """,
                 (user_id, user_memory),
             )
+            memory_id = cursor.fetchone()[0]
             conn.commit()
+            return memory_id
     except Exception as e:
         print(f"Error saving user memory: {e}")
+        return None
+
+# Saves (user_id, memory_text) rows with a single statement and returns
+# their memory_ids in the same order. The rows share a timestamp, but their
+# memory_ids follow the order of `rows`, which is what turns are read back
+# in. Errors are raised so the caller can retry.
+@pooled
+def save_user_memories(rows, conn=None):
+    with conn.cursor() as cursor:
+        memory_ids = psycopg2.extras.execute_values(
+            cursor,
+            "INSERT INTO user_memory (user_id, memory_text) VALUES %s RETURNING memory_id",
+            rows,
+            page_size=len(rows),
+            fetch=True,
+        )
+        conn.commit()
+        return [result[0] for result in memory_ids]
+
+# (memory_id, memory_text) rows saved after after_id, for indexing
+@pooled
+def fetch_memory_rows(user_id, after_id=0, conn=None):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT memory_id, memory_text FROM user_memory
+            WHERE user_id = %s AND memory_id > %s ORDER BY memory_id
+        """,
+            (user_id, after_id),
+        )
+        return cursor.fetchall()
+
+# The texts of the given memory rows, keyed by memory_id
+@pooled
+def fetch_memory_texts(user_id, memory_ids, conn=None):
+    try:
+        with conn.cursor() as cursor, metrics.span("db_fetch", query="memory_texts"):
+            cursor.execute(
+                """
+                SELECT memory_id, memory_text FROM user_memory
+                WHERE user_id = %s AND memory_id = ANY(%s)
+            """,
+                (user_id, list(memory_ids)),
+            )
+            return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"Error fetching user memory: {e}")
+        return {}
 
-def fetch_user_name(user_id, conn):
+@cached("name")
+@pooled
+def fetch_user_name(user_id, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute("SELECT name FROM users WHERE user_id = %s", (user_id,))
@@ -58,7 +262,8 @@ def fetch_user_name(user_id, conn):
         print(f"Error fetching user name: {e}")
         return None
 
-def update_user_name(user_id, name, conn):
+@pooled
+def update_user_name(user_id, name, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -67,6 +272,7 @@ def update_user_name(user_id, name, conn):
             conn.commit()
     except Exception as e:
         print(f"Error updating user name: {e}")
+    profile_cache.invalidate(user_id, "name")
 
 def get_raphael_identity():
     identities = [
@@ -106,7 +312,9 @@ def get_suggestions(user_preferences):
             suggestions.append("You could read a new book.")
     return random.sample(suggestions, 3)
 
-def fetch_user_details(user_id, conn):
+@cached("details")
+@pooled
+def fetch_user_details(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT detail_type, detail_value FROM user_details WHERE user_id = %s",
@@ -116,7 +324,9 @@ def fetch_user_details(user_id, conn):
         details = {result[0]: result[1] for result in results}
         return details
 
-def fetch_user_preferences(user_id, conn):
+@cached("preferences")
+@pooled
+def fetch_user_preferences(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT preference_type, preference_value FROM user_preferences WHERE user_id = %s",
@@ -126,7 +336,9 @@ def fetch_user_preferences(user_id, conn):
         preferences = {result[0]: result[1] for result in results}
         return preferences
 
-def fetch_medical_conditions(user_id, conn):
+@cached("conditions")
+@pooled
+def fetch_medical_conditions(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT condition_name, diagnosis_date, status FROM medical_conditions WHERE user_id = %s",
@@ -143,7 +355,9 @@ def fetch_medical_conditions(user_id, conn):
         ]
         return conditions
 
-def fetch_medications(user_id, conn):
+@cached("medications")
+@pooled
+def fetch_medications(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT medication_name, dosage, start_date, end_date, prescribing_doctor FROM medications WHERE user_id = %s",
@@ -162,7 +376,9 @@ def fetch_medications(user_id, conn):
         ]
         return medications
 
-def fetch_immunizations(user_id, conn):
+@cached("immunizations")
+@pooled
+def fetch_immunizations(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT vaccine_name, vaccination_date FROM immunizations WHERE user_id = %s",
@@ -175,7 +391,9 @@ def fetch_immunizations(user_id, conn):
         ]
         return immunizations
 
-def fetch_doctor_visits(user_id, conn):
+@cached("doctor_visits")
+@pooled
+def fetch_doctor_visits(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT doctor_name, visit_date, notes FROM doctor_visits WHERE user_id = %s",
@@ -188,7 +406,9 @@ def fetch_doctor_visits(user_id, conn):
         ]
         return visits
 
-def fetch_insurance_info(user_id, conn):
+@cached("insurance_info")
+@pooled
+def fetch_insurance_info(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT provider_name, policy_number, coverage_details FROM insurance_info WHERE user_id = %s",
@@ -205,7 +425,9 @@ def fetch_insurance_info(user_id, conn):
         ]
         return insurance
 
-def fetch_health_metrics(user_id, conn):
+@cached("health_metrics")
+@pooled
+def fetch_health_metrics(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT metric_name, metric_value, recorded_date FROM health_metrics WHERE user_id = %s",
@@ -222,7 +444,9 @@ def fetch_health_metrics(user_id, conn):
         ]
         return metrics
 
-def fetch_investments(user_id, conn):
+@cached("investments")
+@pooled
+def fetch_investments(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT investment_type, investment_value, investment_date FROM investments WHERE user_id = %s",
@@ -239,7 +463,9 @@ def fetch_investments(user_id, conn):
         ]
         return investments
 
-def fetch_retirement_accounts(user_id, conn):
+@cached("retirement_accounts")
+@pooled
+def fetch_retirement_accounts(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT account_type, account_value, institution FROM retirement_accounts WHERE user_id = %s",
@@ -256,7 +482,9 @@ def fetch_retirement_accounts(user_id, conn):
         ]
         return accounts
 
-def fetch_tax_information(user_id, conn):
+@cached("tax_information")
+@pooled
+def fetch_tax_information(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT tax_year, filing_status, taxable_income FROM tax_information WHERE user_id = %s",
@@ -273,7 +501,9 @@ def fetch_tax_information(user_id, conn):
         ]
         return taxes
 
-def fetch_expense_tracking(user_id, conn):
+@cached("expense_tracking")
+@pooled
+def fetch_expense_tracking(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT expense_category, expense_amount, expense_date FROM expense_tracking WHERE user_id = %s",
@@ -290,7 +520,9 @@ def fetch_expense_tracking(user_id, conn):
         ]
         return expenses
 
-def fetch_professional_info(user_id, conn):
+@cached("professional")
+@pooled
+def fetch_professional_info(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT employment_history, current_job, skills_certifications FROM professional_info WHERE user_id = %s",
@@ -306,7 +538,9 @@ def fetch_professional_info(user_id, conn):
         else:
             return {}
 
-def fetch_educational_data(user_id, conn):
+@cached("education")
+@pooled
+def fetch_educational_data(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT degrees, courses, languages FROM educational_data WHERE user_id = %s",
@@ -318,7 +552,9 @@ def fetch_educational_data(user_id, conn):
         else:
             return {}
 
-def fetch_preferences_interests(user_id, conn):
+@cached("interests")
+@pooled
+def fetch_preferences_interests(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT hobbies, food_preferences, travel_preferences, entertainment FROM preferences_interests WHERE user_id = %s",
@@ -335,7 +571,9 @@ def fetch_preferences_interests(user_id, conn):
         else:
             return {}
 
-def fetch_social_connections(user_id, conn):
+@cached("social")
+@pooled
+def fetch_social_connections(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT family_members, friends, social_media_accounts FROM social_connections WHERE user_id = %s",
@@ -351,7 +589,9 @@ def fetch_social_connections(user_id, conn):
         else:
             return {}
 
-def fetch_security_info(user_id, conn):
+@cached("security")
+@pooled
+def fetch_security_info(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT passwords, security_questions FROM security_info WHERE user_id = %s",
@@ -363,7 +603,9 @@ def fetch_security_info(user_id, conn):
         else:
             return {}
 
-def fetch_miscellaneous_info(user_id, conn):
+@cached("miscellaneous")
+@pooled
+def fetch_miscellaneous_info(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT vehicle_info, property_info, subscriptions, shopping_history FROM miscellaneous_info WHERE user_id = %s",
@@ -380,7 +622,9 @@ def fetch_miscellaneous_info(user_id, conn):
         else:
             return {}
 
-def fetch_cards(user_id, conn):
+@cached("cards")
+@pooled
+def fetch_cards(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT card_type, card_number, expiry_date, cvv FROM cards WHERE user_id = %s",
@@ -398,7 +642,9 @@ def fetch_cards(user_id, conn):
         ]
         return cards
 
-def fetch_bank_accounts(user_id, conn):
+@cached("bank_accounts")
+@pooled
+def fetch_bank_accounts(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT bank_name, account_number, routing_number FROM bank_accounts WHERE user_id = %s",
@@ -415,7 +661,9 @@ def fetch_bank_accounts(user_id, conn):
         ]
         return bank_accounts
 
-def fetch_loans(user_id, conn):
+@cached("loans")
+@pooled
+def fetch_loans(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT loan_type, loan_amount, loan_date, due_date FROM loans WHERE user_id = %s",
@@ -433,7 +681,9 @@ def fetch_loans(user_id, conn):
         ]
         return loans
 
-def fetch_salaries(user_id, conn):
+@cached("salaries")
+@pooled
+def fetch_salaries(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT salary_amount, salary_date FROM salaries WHERE user_id = %s",
@@ -445,7 +695,9 @@ def fetch_salaries(user_id, conn):
         ]
         return salaries
 
-def fetch_debts(user_id, conn):
+@cached("debts")
+@pooled
+def fetch_debts(user_id, conn=None):
     with conn.cursor() as cursor:
         cursor.execute(
             "SELECT debt_type, debt_amount, debt_date FROM debts WHERE user_id = %s",
@@ -458,7 +710,124 @@ def fetch_debts(user_id, conn):
         ]
         return debts
 
-def fetch_request_changes(user_id, table, conn):
+# Sections loaded by fetch_user_profile as (group, section, table, columns,
+# shape). The shape mirrors the matching fetch_* function: "pairs" builds a
+# dict from key/value rows, "many" a list of row dicts and "one" a dict for
+# the first row (or {} when there is none).
+PROFILE_SECTIONS = [
+    (None, "details", "user_details", ("detail_type", "detail_value"), "pairs"),
+    (None, "preferences", "user_preferences", ("preference_type", "preference_value"), "pairs"),
+    ("medical", "conditions", "medical_conditions", ("condition_name", "diagnosis_date", "status"), "many"),
+    ("medical", "medications", "medications", ("medication_name", "dosage", "start_date", "end_date", "prescribing_doctor"), "many"),
+    ("medical", "immunizations", "immunizations", ("vaccine_name", "vaccination_date"), "many"),
+    ("medical", "doctor_visits", "doctor_visits", ("doctor_name", "visit_date", "notes"), "many"),
+    ("medical", "insurance_info", "insurance_info", ("provider_name", "policy_number", "coverage_details"), "many"),
+    ("medical", "health_metrics", "health_metrics", ("metric_name", "metric_value", "recorded_date"), "many"),
+    ("financial", "investments", "investments", ("investment_type", "investment_value", "investment_date"), "many"),
+    ("financial", "retirement_accounts", "retirement_accounts", ("account_type", "account_value", "institution"), "many"),
+    ("financial", "tax_information", "tax_information", ("tax_year", "filing_status", "taxable_income"), "many"),
+    ("financial", "expense_tracking", "expense_tracking", ("expense_category", "expense_amount", "expense_date"), "many"),
+    ("financial", "cards", "cards", ("card_type", "card_number", "expiry_date", "cvv"), "many"),
+    ("financial", "bank_accounts", "bank_accounts", ("bank_name", "account_number", "routing_number"), "many"),
+    ("financial", "loans", "loans", ("loan_type", "loan_amount", "loan_date", "due_date"), "many"),
+    ("financial", "salaries", "salaries", ("salary_amount", "salary_date"), "many"),
+    ("financial", "debts", "debts", ("debt_type", "debt_amount", "debt_date"), "many"),
+    (None, "professional", "professional_info", ("employment_history", "current_job", "skills_certifications"), "one"),
+    (None, "education", "educational_data", ("degrees", "courses", "languages"), "one"),
+    (None, "social", "social_connections", ("family_members", "friends", "social_media_accounts"), "one"),
+    (None, "security", "security_info", ("passwords", "security_questions"), "one"),
+    (None, "miscellaneous", "miscellaneous_info", ("vehicle_info", "property_info", "subscriptions", "shopping_history"), "one"),
+    (None, "interests", "preferences_interests", ("hobbies", "food_preferences", "travel_preferences", "entertainment"), "one"),
+]
+
+def _profile_section_sql(table, columns, shape):
+    row = f"json_build_array({', '.join(columns)})"
+    if shape == "one":
+        return f"(SELECT {row} FROM {table} WHERE user_id = %(user_id)s LIMIT 1)"
+    return f"(SELECT json_agg({row}) FROM {table} WHERE user_id = %(user_id)s)"
+
+# The requested sections are gathered into one JSON document so loading
+# them costs a single round-trip
+@functools.lru_cache(maxsize=None)
+def _profile_query(sections):
+    return "SELECT json_build_object({})::text".format(
+        ", ".join(
+            f"'{section}', {_profile_section_sql(table, columns, shape)}"
+            for _, section, table, columns, shape in PROFILE_SECTIONS
+            if section in sections
+        )
+    )
+
+# JSON has no date type, so date columns are turned back into the date and
+# datetime values psycopg2 returns for them
+def _decode_profile_value(column, value):
+    if isinstance(value, str) and column.endswith("_date"):
+        try:
+            if len(value) == 10:
+                return date.fromisoformat(value)
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+def _decode_profile_row(columns, row):
+    return {
+        column: _decode_profile_value(column, value)
+        for column, value in zip(columns, row)
+    }
+
+@pooled
+def _query_user_profile(user_id, sections, conn=None):
+    # All missing sections come back in one round-trip, so the query is timed
+    # as a whole
+    with conn.cursor() as cursor, metrics.span("db_fetch", query="profile"):
+        cursor.execute(_profile_query(sections), {"user_id": user_id})
+        # Non-integer numbers are read as Decimal, like psycopg2 does for NUMERIC
+        rows = json.loads(cursor.fetchone()[0], parse_float=Decimal)
+    loaded = {}
+    for _, section, _, columns, shape in PROFILE_SECTIONS:
+        if section not in sections:
+            continue
+        if shape == "pairs":
+            value = {key: item for key, item in rows[section] or []}
+        elif shape == "many":
+            value = [_decode_profile_row(columns, row) for row in rows[section] or []]
+        else:
+            value = _decode_profile_row(columns, rows[section]) if rows[section] else {}
+        loaded[section] = value
+    return loaded
+
+# Returns the profile grouped like fetch_user_data used to build it. When
+# `sections` is given only those sections are loaded and returned. Cached
+# sections are served from the profile cache and the rest are read together.
+def fetch_user_profile(user_id, conn=None, sections=None):
+    loaded = {}
+    missing = []
+    for _, section, _, _, _ in PROFILE_SECTIONS:
+        if sections is not None and section not in sections:
+            continue
+        value = profile_cache.get(user_id, section)
+        if value is MISSING:
+            missing.append(section)
+        else:
+            loaded[section] = value
+    if missing:
+        version = profile_cache.version(user_id)
+        for section, value in _query_user_profile(user_id, tuple(missing), conn).items():
+            profile_cache.put(user_id, section, value, version)
+            loaded[section] = value
+    profile = {}
+    for group, section, _, _, _ in PROFILE_SECTIONS:
+        if section not in loaded:
+            continue
+        if group:
+            profile.setdefault(group, {})[section] = loaded[section]
+        else:
+            profile[section] = loaded[section]
+    return profile
+
+@pooled
+def fetch_request_changes(user_id, table, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -473,7 +842,8 @@ def fetch_request_changes(user_id, table, conn):
         print(f"Error fetching request_changes from {table}: {e}")
         return True
 
-def update_request_changes(user_id, table, status, conn):
+@pooled
+def update_request_changes(user_id, table, status, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -483,8 +853,12 @@ def update_request_changes(user_id, table, status, conn):
             conn.commit()
     except Exception as e:
         print(f"Error updating request_changes in {table}: {e}")
+    for _, section, section_table, _, _ in PROFILE_SECTIONS:
+        if section_table == table:
+            profile_cache.invalidate(user_id, section)
 
-def add_user(user_id, name, email, phone, birthday, conn):
+@pooled
+def add_user(user_id, name, email, phone, birthday, conn=None):
     try:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -497,3 +871,4 @@ def add_user(user_id, name, email, phone, birthday, conn):
             conn.commit()
     except Exception as e:
         print(f"Error adding user: {e}")
+    profile_cache.invalidate_user(user_id)
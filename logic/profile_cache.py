@@ -0,0 +1,167 @@
+# logic/profile_cache.py
+
+# Description: In-memory LRU + TTL cache for user profile sections, so
+# repeat sessions for the same user do not go back to the database.
+
+import functools
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class SharedVersions:
+    """
+    A version per user, kept in memory that processes forked after it was
+    created share. Changing a user's version invalidates what every process
+    cached for the user. Users are hashed to a fixed number of slots, so
+    users sharing a slot only cost each other extra misses.
+
+    Args:
+    - slots (int): Number of version slots.
+    """
+
+    def __init__(self, slots=65536):
+        self.slots = slots
+        # Anonymous mappings are shared with forked children
+        self.memory = mmap.mmap(-1, slots * 8)
+
+    def offset(self, user_id):
+        return zlib.crc32(str(user_id).encode("utf-8")) % self.slots * 8
+
+    def get(self, user_id):
+        offset = self.offset(user_id)
+        return self.memory[offset : offset + 8]
+
+    def bump(self, user_id):
+        offset = self.offset(user_id)
+        # A random value rather than an increment, so two processes bumping
+        # at once still leave a version neither of them cached under
+        self.memory[offset : offset + 8] = os.urandom(8)
+
+
+class ProfileCache:
+    """
+    Bounded cache keyed by (user_id, section). Entries expire after `ttl`
+    seconds and the least recently used entry is evicted once `max_entries`
+    is reached. Cached values are shared between callers and must not be
+    modified in place.
+
+    Invalidating an entry also changes the user's shared version, so in
+    pre-fork worker mode the other workers drop the user's entries on their
+    next lookup instead of serving them until they expire.
+
+    Args:
+    - max_entries (int): Maximum number of cached sections.
+    - ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.versions = SharedVersions()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, section):
+        """
+        Look up a cached section.
+
+        Args:
+        - user_id (str): Unique identifier for the user.
+        - section (str): Name of the profile section.
+
+        Returns:
+        - The cached value, or MISSING when it is absent or expired.
+        """
+        key = (user_id, section)
+        version = self.versions.get(user_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[2] != version:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def version(self, user_id):
+        """
+        The user's current version. Take it before reading a section from the
+        database and pass it to put(), so a value read before an invalidation
+        is not cached as current.
+        """
+        return self.versions.get(user_id)
+
+    def put(self, user_id, section, value, version=None):
+        key = (user_id, section)
+        if version is None:
+            version = self.versions.get(user_id)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value, version)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id, section):
+        # Other processes only see that the user changed
+        self.versions.bump(user_id)
+        with self.lock:
+            self.entries.pop((user_id, section), None)
+
+    def invalidate_user(self, user_id):
+        self.versions.bump(user_id)
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def cached_section(cache, section):
+    """
+    Decorator caching the result of a `fetch_*(user_id, ...)` function under
+    (user_id, section).
+
+    Args:
+    - cache (ProfileCache): The cache to use.
+    - section (str): Name of the profile section.
+
+    Returns:
+    - callable: The decorator.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(user_id, *args, **kwargs):
+            value = cache.get(user_id, section)
+            if value is MISSING:
+                version = cache.version(user_id)
+                value = func(user_id, *args, **kwargs)
+                cache.put(user_id, section, value, version)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,222 @@
+# logic/profile_format.py
+
+# Description: Compact, line-oriented rendering of profile sections for the
+# prompt. Compared with JSON it leaves out braces, quotes, null fields and
+# empty sections, shortens repeated column prefixes and writes dates briefly,
+# so the same profile costs far fewer prompt tokens.
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def format_value(value):
+    """
+    Render a single field.
+
+    Args:
+    - value: The field as loaded from the database.
+
+    Returns:
+    - str: The rendered value, "" for nulls and empty values.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if value.time() == datetime.min.time():
+            return value.date().isoformat()
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, Decimal):
+        # 12.50 -> 12.5, 1000.00 -> 1000
+        return f"{value.normalize():f}"
+    if isinstance(value, (list, tuple)):
+        return "; ".join(text for text in map(format_value, value) if text)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str) if value else ""
+    return str(value).strip()
+
+
+def singular(name):
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("s"):
+        return name[:-1]
+    return name
+
+
+def short_keys(section, columns):
+    """
+    Shorten column names by the prefix they repeat: the section's own name
+    (medication_name in medications) or a first word all columns share
+    (expense_amount, expense_date in expense_tracking).
+
+    Args:
+    - section (str): Name of the profile section.
+    - columns (list): The column names.
+
+    Returns:
+    - dict: Short name keyed by column name.
+    """
+    firsts = {column.split("_", 1)[0] for column in columns}
+    shared = firsts.pop() if len(firsts) == 1 and len(columns) > 1 else None
+    prefixes = [f"{singular(section)}_"]
+    if shared:
+        prefixes.append(f"{shared}_")
+    keys = {}
+    for column in columns:
+        keys[column] = column
+        for prefix in prefixes:
+            if column.startswith(prefix) and len(column) > len(prefix):
+                keys[column] = column[len(prefix) :]
+                break
+    return keys
+
+
+def format_fields(fields, section=None):
+    """
+    Render a dict of fields as "key=value" pairs, leaving out empty ones.
+
+    Args:
+    - fields (dict): The fields.
+    - section (str): Name of the section the fields belong to, used to
+      shorten the keys.
+
+    Returns:
+    - str: The rendered fields, "" when all of them are empty.
+    """
+    keys = short_keys(section, list(fields)) if section else {}
+    parts = []
+    for column, value in fields.items():
+        text = format_value(value)
+        if text:
+            parts.append(f"{keys.get(column, column)}={text}")
+    return ", ".join(parts)
+
+
+def format_rows(section, rows):
+    """
+    Render the rows of one table of a grouped section, one line per row.
+
+    Args:
+    - section (str): Name of the table's section, e.g. "medications".
+    - rows (list): The row dicts.
+
+    Returns:
+    - list: The lines of the non-empty rows.
+    """
+    lines = []
+    for row in rows:
+        text = format_fields(row, section)
+        if text:
+            lines.append(f"{section}: {text}")
+    return lines
+
+
+def is_grouped(value):
+    # Grouped sections (medical, financial) map tables to lists of row
+    # dicts; other sections may hold array columns, but not of dicts
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(
+            isinstance(rows, list) and all(isinstance(row, dict) for row in rows)
+            for rows in value.values()
+        )
+    )
+
+
+def format_section(label, value):
+    """
+    Render one profile section as prompt lines.
+
+    Args:
+    - label (str): Heading of the section, e.g. "User Medical".
+    - value: The section as returned by fetch_user_profile: a dict of fields,
+      or for grouped sections a dict of lists of rows.
+
+    Returns:
+    - list: The lines, empty when the section holds nothing.
+    """
+    if not isinstance(value, dict):
+        text = format_value(value)
+        return [f"{label}: {text}"] if text else []
+    if is_grouped(value):
+        lines = []
+        for section, rows in value.items():
+            lines.extend(format_rows(section, rows))
+        return [label] + lines if lines else []
+    text = format_fields(value)
+    return [f"{label}: {text}"] if text else []
+
+
+class ProfileFormatter:
+    """
+    Renders profiles with format_section and remembers the result for each
+    section value. Sections served by the profile cache are the same objects
+    until the cache reloads them, so a section is rendered once per version
+    instead of on every turn.
+
+    Args:
+    - max_entries (int): Maximum number of rendered sections kept.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        # id(value) -> (value, label, lines). Holding the value keeps its id
+        # from being reused by another object.
+        self.rendered = OrderedDict()
+        self.lock = threading.Lock()
+
+    def remember(self, value, label, render):
+        key = id(value)
+        with self.lock:
+            entry = self.rendered.get(key)
+            if entry is not None and entry[0] is value and entry[1] == label:
+                self.rendered.move_to_end(key)
+                return entry[2]
+        lines = render()
+        with self.lock:
+            self.rendered[key] = (value, label, lines)
+            self.rendered.move_to_end(key)
+            while len(self.rendered) > self.max_entries:
+                self.rendered.popitem(last=False)
+        return lines
+
+    def format_profile(self, profile, labels):
+        """
+        Render the profile sections in the given order.
+
+        Args:
+        - profile (dict): The profile sections returned by fetch_user_profile.
+        - labels (list): (key, label) pairs in prompt order.
+
+        Returns:
+        - list: The lines of all non-empty sections.
+        """
+        lines = []
+        for key, label in labels:
+            if key not in profile:
+                continue
+            value = profile[key]
+            # Grouped sections are rebuilt per fetch around the cached lists,
+            # so those are remembered one list at a time
+            if is_grouped(value):
+                group_lines = []
+                for section, rows in value.items():
+                    group_lines.extend(
+                        self.remember(rows, section, lambda: format_rows(section, rows))
+                    )
+                if group_lines:
+                    lines.append(label)
+                    lines.extend(group_lines)
+            else:
+                lines.extend(
+                    self.remember(value, label, lambda: format_section(label, value))
+                )
+        return lines
@@ -0,0 +1,118 @@
+# logic/response_cache.py
+
+# Description: Cache of generated replies for prompts that are asked again
+# and again, kept in a SQLite file so it survives restarts.
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+NORMALIZE_PATTERN = re.compile(r"\w+")
+
+
+def response_key(prompt, profile, config):
+    """
+    Build the cache key for a reply: the prompt with case, spacing and
+    punctuation normalized away, a fingerprint of the profile sections the
+    reply was generated from, and the generation parameters.
+
+    Args:
+    - prompt (str): The prompt for this turn.
+    - profile (dict): The profile sections added to the model input.
+    - config (dict): The text generation parameters.
+
+    Returns:
+    - str: The key.
+    """
+    normalized = " ".join(NORMALIZE_PATTERN.findall(prompt.lower()))
+    material = json.dumps([normalized, profile, config], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Bounded reply cache stored in SQLite. Entries expire after `ttl` seconds
+    and the least recently used entries are evicted once `max_entries` is
+    exceeded.
+
+    Args:
+    - path (str): Path of the SQLite file, or ":memory:".
+    - max_entries (int): Maximum number of cached replies.
+    - ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, path, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Losing the last few writes on a crash only costs cache misses
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up a cached reply.
+
+        Returns:
+        - str: The reply, or None when it is not cached or has expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            # Expired entries go first, then the least recently used ones
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self.conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+            """,
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            (entries,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,103 @@
+# logic/section_router.py
+
+# Description: Picks the profile sections that are relevant to a prompt, so
+# only those are fetched and added to the model's input.
+
+import re
+from logic.utils import load_config
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Column name parts that say nothing about what a section is about
+GENERIC_WORDS = {
+    "name", "type", "value", "date", "info", "information", "detail", "status",
+    "note", "amount", "start", "end", "current", "history", "user", "data",
+    "number", "year", "due", "recorded", "question", "member",
+}
+
+
+def normalize_word(word):
+    """
+    Reduce a word to the form used in the index, folding simple plurals.
+
+    Args:
+    - word (str): A lowercase word.
+
+    Returns:
+    - str: The normalized word.
+    """
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def prompt_words(prompt):
+    return {normalize_word(word) for word in WORD_PATTERN.findall(prompt.lower())}
+
+
+class SectionRouter:
+    """
+    Keyword index from words to profile sections. The index is built from the
+    section schemas (section, table and column names) plus extra keywords per
+    section or per group of sections.
+
+    Args:
+    - sections (list): (group, section, table, columns, shape) tuples as in
+      model_memory_logic.PROFILE_SECTIONS.
+    - group_keywords (dict): Extra keywords selecting every section of a group.
+    - section_keywords (dict): Extra keywords selecting a single section.
+    - always (iterable): Sections included for every prompt.
+    """
+
+    def __init__(self, sections, group_keywords=None, section_keywords=None, always=()):
+        self.index = {}
+        self.always = set(always)
+        for group, section, table, columns, _ in sections:
+            words = set()
+            for name in (section, table) + tuple(columns):
+                words.update(name.split("_"))
+            words.update((section_keywords or {}).get(section, []))
+            if group:
+                words.add(group)
+                words.update((group_keywords or {}).get(group, []))
+            for word in words:
+                word = normalize_word(word.lower())
+                if word not in GENERIC_WORDS:
+                    self.index.setdefault(word, set()).add(section)
+
+    def route(self, prompt):
+        """
+        Select the sections relevant to a prompt.
+
+        Args:
+        - prompt (str): The prompt provided by the user.
+
+        Returns:
+        - set: The names of the selected sections.
+        """
+        selected = set(self.always)
+        for word in prompt_words(prompt):
+            selected.update(self.index.get(word, ()))
+        return selected
+
+
+def load_section_router(config_file, sections):
+    """
+    Build a SectionRouter from the keywords in a configuration file.
+
+    Args:
+    - config_file (str): Path to the section keyword configuration.
+    - sections (list): The profile section definitions.
+
+    Returns:
+    - SectionRouter: The router.
+    """
+    config = load_config(config_file)
+    return SectionRouter(
+        sections,
+        group_keywords=config.get("groups"),
+        section_keywords=config.get("sections"),
+        always=config.get("always", []),
+    )
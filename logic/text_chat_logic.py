@@ -3,15 +3,34 @@
 # Description: This file contains the logic for the text chat functionality.
 
 import json
+import threading
+from logic.keyword_matcher import KeywordMatcher
 
 # Load follow-up messages from the configuration file
 FOLLOWUP_CONFIG_FILE = "/home/ncacord/qRaphael/config/followup_messages.json"
 
-with open(FOLLOWUP_CONFIG_FILE, "r") as file:
-    followup_config = json.load(file)
-
-followup_messages = followup_config["keywords"]
-default_message = followup_config["default_message"]
+_followups = None
+_followups_lock = threading.Lock()
+
+# The configuration is loaded on first use, so the module can be imported
+# where the file is not installed. The keywords are compiled once, so a text
+# is scanned in a single pass however many keywords there are. Earlier
+# keywords win, as before.
+def load_followups():
+    global _followups
+    with _followups_lock:
+        if _followups is None:
+            with open(FOLLOWUP_CONFIG_FILE, "r") as file:
+                followup_config = json.load(file)
+            followup_messages = followup_config["keywords"]
+            followup_keywords = list(followup_messages)
+            _followups = (
+                followup_messages,
+                followup_keywords,
+                KeywordMatcher(followup_keywords),
+                followup_config["default_message"],
+            )
+        return _followups
 
 # Define the follow-up message logic
 def get_followup_message(prompt, generated_text):
@@ -25,17 +44,12 @@ def get_followup_message(prompt, generated_text):
     Returns:
     - str: The follow-up message.
     """
-    # Check for keywords in the prompt
-    prompt_lower = prompt.lower()
-    for keyword, message in followup_messages.items():
-        if keyword in prompt_lower:
-            return message
-
-    # Check for keywords in the generated text
-    generated_text_lower = generated_text.lower()
-    for keyword, message in followup_messages.items():
-        if keyword in generated_text_lower:
-            return message
+    followup_messages, followup_keywords, followup_matcher, default_message = load_followups()
+    # Check for keywords in the prompt, then in the generated text
+    for text in (prompt, generated_text):
+        index = followup_matcher.first(text.lower())
+        if index is not None:
+            return followup_messages[followup_keywords[index]]
 
     # Default follow-up message
     return default_message
@@ -16,6 +16,20 @@ def load_config(config_file):
     return config
 
 
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a piece of text without loading a
+    tokenizer, at roughly four characters per token.
+
+    Args:
+    - text (str): The text to measure.
+
+    Returns:
+    - int: The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
 def handle_raphael_identity():
     """
     Handle questions about Raphael's identity and capabilities.
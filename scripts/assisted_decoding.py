@@ -0,0 +1,84 @@
+# scripts/assisted_decoding.py
+
+# Description: Assisted (speculative) decoding. A small draft model sharing
+# the main model's tokenizer proposes a few tokens at a time, and the main
+# model checks them all in one forward pass, keeping the ones it agrees with.
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def load_assistant_model(model_dir, dtype, num_assistant_tokens):
+    """
+    Load the draft model used by model.generate(assistant_model=...).
+
+    Args:
+    - model_dir (str): Directory or hub id of the draft model. It must use
+      the main model's tokenizer.
+    - dtype: The dtype argument for from_pretrained.
+    - num_assistant_tokens (int): Tokens proposed per verification step.
+
+    Returns:
+    - The loaded draft model.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    logger.info(f"Loading assistant model from {model_dir}...")
+    model = AutoModelForCausalLM.from_pretrained(
+        model_dir, torch_dtype=dtype, low_cpu_mem_usage=True
+    )
+    model.to("cuda" if torch.cuda.is_available() else "cpu")
+    model.eval()
+    # A fixed number of proposals per step keeps the acceptance rate
+    # comparable between requests
+    model.generation_config.num_assistant_tokens = num_assistant_tokens
+    model.generation_config.num_assistant_tokens_schedule = "constant"
+    return model
+
+
+class AcceptanceStats:
+    """
+    Running totals of draft tokens proposed and accepted. Every verification
+    step yields the accepted draft tokens plus one token of the main model's
+    own, so both follow from the steps and tokens generated.
+    """
+
+    def __init__(self):
+        self.proposed = 0
+        self.accepted = 0
+        self.lock = threading.Lock()
+
+    def record(self, steps, tokens, num_assistant_tokens):
+        """
+        Add a generation's counts.
+
+        Args:
+        - steps (int): Verification steps, i.e. main model forward passes
+          after the prompt.
+        - tokens (int): Tokens generated.
+        - num_assistant_tokens (int): Tokens proposed per step.
+
+        Returns:
+        - float: The generation's acceptance rate.
+        """
+        accepted = max(tokens - steps, 0)
+        proposed = steps * num_assistant_tokens
+        with self.lock:
+            self.proposed += proposed
+            self.accepted += accepted
+        return accepted / proposed if proposed else 0.0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "proposed_tokens": self.proposed,
+                "accepted_tokens": self.accepted,
+                "acceptance_rate": self.accepted / self.proposed if self.proposed else 0.0,
+            }
+
+
+# The process-wide totals, exported as gauges by the inference server
+acceptance = AcceptanceStats()
@@ -0,0 +1,319 @@
+# scripts/batching.py
+
+# Description: Dynamic batching in front of model.generate. Requests that
+# arrive within a short window are generated together as one padded batch,
+# and each caller receives its own reply as it is produced.
+
+import logging
+import queue
+import threading
+import time
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+from generation import SentenceBuffer, encode_prompts, log_generation_stats, stream_text
+from logic.metrics import metrics
+from stopping_criteria import SentenceStopping
+
+logger = logging.getLogger(__name__)
+
+# Parameters that must match for requests to share a batch
+SAMPLING_KEYS = ("do_sample", "temperature", "top_k", "top_p", "repetition_penalty")
+
+DONE = object()
+
+
+class GenerationRequest:
+    """
+    A prompt waiting for generation. The scheduler puts the reply's pieces on
+    the request's queue and the caller reads them with stream().
+
+    Args:
+    - prompt (str): The full model input.
+    - config (dict): The text generation parameters.
+    - prefix_cache (PrefixCache): The session's prefix cache, if any.
+    - token_buffer (TokenBuffer): The session's token buffer, if any.
+    """
+
+    def __init__(self, prompt, config, prefix_cache=None, token_buffer=None):
+        self.prompt = prompt
+        self.config = config
+        self.prefix_cache = prefix_cache
+        self.token_buffer = token_buffer
+        self.chunks = queue.Queue()
+
+    def put(self, chunk):
+        self.chunks.put(chunk)
+
+    def finish(self, error=None):
+        self.chunks.put(error if error is not None else DONE)
+
+    def stream(self):
+        while True:
+            item = self.chunks.get()
+            if item is DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class RowLimits(StoppingCriteria):
+    """
+    Stop each row of a batch at its own request's token and time limit.
+
+    Args:
+    - prompt_length (int): Length of the padded prompts.
+    - max_new_tokens (list): New token limit per row.
+    - deadlines (list): time.monotonic() deadline per row.
+    """
+
+    def __init__(self, prompt_length, max_new_tokens, deadlines):
+        self.prompt_length = prompt_length
+        self.max_new_tokens = max_new_tokens
+        self.deadlines = deadlines
+
+    def __call__(self, input_ids, scores, **kwargs):
+        generated = input_ids.shape[1] - self.prompt_length
+        now = time.monotonic()
+        done = [
+            generated >= limit or now >= deadline
+            for limit, deadline in zip(self.max_new_tokens, self.deadlines)
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class RowEnds(StoppingCriteria):
+    """
+    Combine per-row stopping criteria and record when each row is ended, so
+    a row that stops early is not charged for the rest of the batch.
+
+    Args:
+    - criteria (list): The criteria; a row is done once any of them says so.
+    - rows (int): Rows in the batch.
+    """
+
+    def __init__(self, criteria, rows):
+        self.criteria = criteria
+        self.end_times = [None] * rows
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = self.criteria[0](input_ids, scores, **kwargs)
+        for criterion in self.criteria[1:]:
+            done = done | criterion(input_ids, scores, **kwargs)
+        now = time.perf_counter()
+        for row, finished in enumerate(done.tolist()):
+            if finished and self.end_times[row] is None:
+                self.end_times[row] = now
+        return done
+
+
+class BatchStreamer(BaseStreamer):
+    """
+    Streamer for a batch: decodes each row's new tokens and passes complete
+    sentences on to the row's request.
+
+    Args:
+    - tokenizer: The loaded tokenizer.
+    - requests (list): The GenerationRequest for each row.
+    """
+
+    def __init__(self, tokenizer, requests):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.tokens = [[] for _ in requests]
+        self.texts = ["" for _ in requests]
+        self.sentences = [
+            SentenceBuffer(request.config.get("stop_strings", ()))
+            for request in requests
+        ]
+        self.first_token_times = [None for _ in requests]
+        # Rows ended by the end-of-sequence token only stop producing tokens
+        self.last_token_times = [None for _ in requests]
+        self.prompt_seen = False
+        self.decode_seconds = 0.0
+
+    def put(self, value):
+        # The first call carries the prompts
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for row, token in enumerate(value.view(-1).tolist()):
+            if token == self.tokenizer.pad_token_id:
+                continue
+            self.last_token_times[row] = time.perf_counter()
+            if self.first_token_times[row] is None:
+                self.first_token_times[row] = self.last_token_times[row]
+            self.tokens[row].append(token)
+            decode_start = time.perf_counter()
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            self.decode_seconds += time.perf_counter() - decode_start
+            new_text, self.texts[row] = text[len(self.texts[row]) :], text
+            ready = self.sentences[row].feed(new_text)
+            if ready:
+                self.requests[row].put(ready)
+
+    def end(self):
+        metrics.observe("detokenize", self.decode_seconds)
+        for row, request in enumerate(self.requests):
+            rest = self.sentences[row].flush()
+            if rest:
+                request.put(rest)
+
+
+class BatchScheduler(threading.Thread):
+    """
+    Background thread that owns model.generate. Requests submitted within
+    `batch_window` seconds of each other, up to `max_batch_size`, are
+    generated together when they share sampling parameters.
+
+    Args:
+    - model: The loaded model.
+    - tokenizer: The loaded tokenizer.
+    - max_batch_size (int): Maximum requests per batch.
+    - batch_window (float): Seconds to wait for more requests after the first.
+    - assistant_model: Draft model for assisted decoding, if any. Only lone
+      requests use it, since assisted generation runs one prompt at a time.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size, batch_window, assistant_model=None):
+        super().__init__(name="batch-scheduler", daemon=True)
+        self.model = model
+        self.tokenizer = tokenizer
+        self.assistant_model = assistant_model
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.pending = queue.Queue()
+        # Decoder-only models need the padding on the left
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+    def submit(self, prompt, config, prefix_cache=None, token_buffer=None):
+        """
+        Queue a prompt for generation.
+
+        Returns:
+        - GenerationRequest: Read the reply with its stream() method.
+        """
+        request = GenerationRequest(prompt, config, prefix_cache, token_buffer)
+        self.pending.put(request)
+        return request
+
+    def stop(self):
+        self.pending.put(None)
+
+    def run(self):
+        while True:
+            request = self.pending.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.batch_window
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            groups = {}
+            for request in batch:
+                key = tuple(request.config[name] for name in SAMPLING_KEYS)
+                groups.setdefault(key, []).append(request)
+            for group in groups.values():
+                self.run_group(group)
+            if stopping:
+                return
+
+    def run_group(self, requests):
+        try:
+            if len(requests) == 1:
+                # A lone request keeps the full single-prompt path, including
+                # the prefix cache
+                request = requests[0]
+                for chunk in stream_text(
+                    request.prompt,
+                    self.model,
+                    self.tokenizer,
+                    request.config,
+                    request.prefix_cache,
+                    self.assistant_model,
+                    request.token_buffer,
+                ):
+                    request.put(chunk)
+            else:
+                self.generate_batch(requests)
+        except Exception as e:
+            logger.exception("Generation failed")
+            for request in requests:
+                if request.prefix_cache is not None:
+                    request.prefix_cache.clear()
+                if request.token_buffer is not None:
+                    request.token_buffer.clear()
+                request.finish(e)
+            return
+        for request in requests:
+            request.finish()
+
+    def generate_batch(self, requests):
+        start_time = time.perf_counter()
+        with metrics.span("tokenize"):
+            inputs = encode_prompts(
+                self.tokenizer,
+                [request.prompt for request in requests],
+                [request.token_buffer for request in requests],
+            )
+        prefill_start = time.perf_counter()
+        prompt_lengths = inputs.attention_mask.sum(dim=1).tolist()
+        max_new_tokens = []
+        deadlines = []
+        for request, prompt_length in zip(requests, prompt_lengths):
+            config = request.config
+            if "max_new_tokens" in config:
+                max_new_tokens.append(config["max_new_tokens"])
+            else:
+                max_new_tokens.append(max(config["max_length"] - prompt_length, 1))
+            deadlines.append(time.monotonic() + config["max_time"])
+        config = requests[0].config
+        criteria = [RowLimits(inputs.input_ids.shape[1], max_new_tokens, deadlines)]
+        stopping = SentenceStopping.from_configs(
+            self.tokenizer,
+            inputs.input_ids.shape[1],
+            [request.config for request in requests],
+        )
+        if stopping:
+            criteria.append(stopping)
+        ends = RowEnds(criteria, len(requests))
+        streamer = BatchStreamer(self.tokenizer, requests)
+        outputs = self.model.generate(
+            inputs.input_ids,
+            attention_mask=inputs.attention_mask,
+            max_new_tokens=max(max_new_tokens),
+            stopping_criteria=StoppingCriteriaList([ends]),
+            pad_token_id=self.tokenizer.pad_token_id,
+            streamer=streamer,
+            do_sample=config["do_sample"],
+            temperature=config["temperature"],
+            top_k=config["top_k"],
+            top_p=config["top_p"],
+            repetition_penalty=config["repetition_penalty"],
+        )
+        for row, prompt_length in enumerate(prompt_lengths):
+            log_generation_stats(
+                prompt_length,
+                len(streamer.tokens[row]),
+                start_time,
+                streamer.first_token_times[row],
+                prefill_start,
+                ends.end_times[row] or streamer.last_token_times[row],
+            )
+        logger.info(
+            f"Batch of {len(requests)} generated {outputs.shape[1] - inputs.input_ids.shape[1]} steps"
+        )
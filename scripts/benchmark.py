@@ -0,0 +1,347 @@
+# scripts/benchmark.py
+
+# Description: End-to-end latency benchmark of the chat pipeline: routing the
+# prompt, loading the selected profile sections, building the prompt,
+# tokenizing, generating and saving the turn, as a chat session does them. Runs offline against a tiny randomly initialized model and synthetic
+# users in a scratch Postgres schema, reports p50/p95 per stage and fails when
+# a stage got slower than the saved baseline allows.
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+# Everything the benchmark creates lives in its own schema, so it can be
+# pointed at a development database without touching the real tables
+BENCHMARK_SCHEMA = "qraphael_benchmark"
+
+TOKENIZER_DIR = "/home/ncacord/qRaphael/models/qRaphael-2b-it"
+
+STAGES = (
+    "route",
+    "fetch_user_profile",
+    "build_prompt",
+    "tokenize",
+    "generate",
+    "save_user_memory",
+)
+
+WORDS = (
+    "walk park dinner budget doctor meeting weekend coffee project trip movie "
+    "sleep workout rent book friend family music garden recipe invoice"
+).split()
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile.
+
+    Args:
+    - samples (list): The measurements.
+    - fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+    - float: The percentile.
+    """
+    ordered = sorted(samples)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize_timings(timings):
+    """
+    Reduce the measurements of each stage to p50 and p95 in milliseconds.
+
+    Args:
+    - timings (dict): Lists of durations in seconds keyed by stage.
+
+    Returns:
+    - dict: {"p50": ms, "p95": ms} keyed by stage.
+    """
+    return {
+        stage: {
+            "p50": round(percentile(samples, 0.5) * 1000, 3),
+            "p95": round(percentile(samples, 0.95) * 1000, 3),
+        }
+        for stage, samples in timings.items()
+        if samples
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compare the results with a baseline.
+
+    Args:
+    - results (dict): Output of summarize_timings.
+    - baseline (dict): Earlier output of summarize_timings.
+    - threshold (float): Allowed slowdown as a fraction, e.g. 0.2 for 20%.
+
+    Returns:
+    - list: A message for every stage whose p50 or p95 grew by more than
+      the threshold.
+    """
+    regressions = []
+    for stage, current in results.items():
+        for statistic in ("p50", "p95"):
+            previous = baseline.get(stage, {}).get(statistic)
+            if previous and current[statistic] > previous * (1 + threshold):
+                regressions.append(
+                    f"{stage} {statistic} {current[statistic]:.1f}ms, "
+                    f"baseline {previous:.1f}ms"
+                )
+    return regressions
+
+
+def column_type(column):
+    if column.endswith("_date"):
+        return "DATE"
+    if column.endswith("_amount") or column.endswith("_income"):
+        return "NUMERIC"
+    return "TEXT"
+
+
+def create_schema(conn, sections):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {BENCHMARK_SCHEMA}")
+        cursor.execute(
+            "CREATE TABLE users (user_id VARCHAR(255) PRIMARY KEY, name VARCHAR(255))"
+        )
+        cursor.execute(
+            """
+            CREATE TABLE user_memory (
+                memory_id SERIAL PRIMARY KEY,
+                user_id VARCHAR(255),
+                memory_text TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        cursor.execute("CREATE INDEX ON user_memory (user_id, memory_id)")
+        cursor.execute(
+            """
+            CREATE TABLE user_memory_summary (
+                user_id VARCHAR(255) PRIMARY KEY,
+                summary_text TEXT,
+                summarized_until_id INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        for _, _, table, columns, _ in sections:
+            definitions = ", ".join(f"{column} {column_type(column)}" for column in columns)
+            cursor.execute(f"CREATE TABLE {table} (user_id VARCHAR(255), {definitions})")
+            cursor.execute(f"CREATE INDEX ON {table} (user_id)")
+    conn.commit()
+
+
+def random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed_users(conn, sections, users, history, rows_per_section, rng):
+    """
+    Fill the schema with synthetic users, each with `history` memory turns
+    and `rows_per_section` rows in every profile table.
+    """
+    with conn.cursor() as cursor:
+        for number in range(users):
+            user_id = f"bench-user-{number}"
+            cursor.execute("INSERT INTO users VALUES (%s, %s)", (user_id, f"User {number}"))
+            cursor.executemany(
+                """
+                INSERT INTO user_memory (user_id, memory_text, timestamp)
+                VALUES (%s, %s, NOW() - %s * INTERVAL '1 minute')
+            """,
+                [(user_id, random_text(rng, 40), history - turn) for turn in range(history)],
+            )
+            cursor.execute(
+                "INSERT INTO user_memory_summary VALUES (%s, %s, 0, NOW())",
+                (user_id, random_text(rng, 60)),
+            )
+            for _, _, table, columns, shape in sections:
+                count = 1 if shape == "one" else rows_per_section
+                for _ in range(count):
+                    values = []
+                    for column in columns:
+                        kind = column_type(column)
+                        if kind == "DATE":
+                            values.append(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                        elif kind == "NUMERIC":
+                            values.append(round(rng.uniform(10, 5000), 2))
+                        else:
+                            values.append(random_text(rng, 4))
+                    placeholders = ", ".join(["%s"] * (len(columns) + 1))
+                    cursor.execute(
+                        f"INSERT INTO {table} VALUES ({placeholders})", [user_id] + values
+                    )
+    conn.commit()
+
+
+def load_tiny_model(tokenizer_dir):
+    """
+    Load the real tokenizer with a small randomly initialized causal LM, so
+    generation exercises the real code paths in a fraction of the time.
+    """
+    from transformers import AutoTokenizer, GPT2Config, GPT2LMHeadModel
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+    model_config = GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=4096,
+        n_embd=64,
+        n_layer=2,
+        n_head=2,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    model = GPT2LMHeadModel(model_config)
+    model.eval()
+    return tokenizer, model
+
+
+def run_benchmark(args, config, tokenizer, model, users, rng):
+    from chat_session import SECTION_CONFIG_FILE, ChatSession, build_prompt, window_memory
+    from generation import encode_prompts, stream_text
+    from logic.model_memory_logic import (
+        PROFILE_SECTIONS,
+        fetch_user_profile,
+        profile_cache,
+        save_user_memory,
+    )
+    from logic.section_router import load_section_router
+
+    generation_config = dict(
+        config,
+        do_sample=False,
+        max_new_tokens=args.new_tokens,
+        target_new_tokens=None,
+        stop_strings=[],
+    )
+    section_router = load_section_router(SECTION_CONFIG_FILE, PROFILE_SECTIONS)
+    # One session per user, opened on first use like a server connection, so
+    # the memory window, prefix cache and token buffer carry over between turns
+    sessions = {}
+    timings = {stage: [] for stage in STAGES}
+
+    def timed(stage, function, *function_args, **kwargs):
+        start = time.perf_counter()
+        result = function(*function_args, **kwargs)
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    for iteration in range(args.warmup + args.iterations):
+        if iteration == args.warmup:
+            timings = {stage: [] for stage in STAGES}
+        user_id = f"bench-user-{rng.randrange(users)}"
+        session = sessions.get(user_id)
+        if session is None:
+            session = sessions[user_id] = ChatSession(
+                user_id, None, generation_config, section_router, None
+            )
+        prompt = random_text(rng, 12)
+        sections = timed("route", section_router.route, prompt)
+        if session.user_name:
+            prompt = f"{session.user_name}, {prompt}"
+        # Measure the database, not the profile cache
+        profile_cache.invalidate_user(user_id)
+        profile = timed("fetch_user_profile", fetch_user_profile, user_id, sections=sections)
+        combined_prompt = timed(
+            "build_prompt",
+            lambda: build_prompt(
+                prompt,
+                window_memory(
+                    session.memory, config["memory_token_budget"], session.memory_summary
+                ),
+                profile,
+            ),
+        )
+        # Generation tokenizes again, which the token buffer makes nearly free
+        timed("tokenize", encode_prompts, tokenizer, [combined_prompt], [session.token_buffer])
+        reply = timed(
+            "generate",
+            lambda: "".join(
+                stream_text(
+                    combined_prompt,
+                    model,
+                    tokenizer,
+                    generation_config,
+                    prefix_cache=session.prefix_cache,
+                    token_buffer=session.token_buffer,
+                )
+            ),
+        )
+        turn = prompt + "\n" + reply
+        session.remember(turn)
+        timed("save_user_memory", save_user_memory, user_id, turn)
+    return summarize_timings(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the chat pipeline against synthetic users."
+    )
+    parser.add_argument("--users", type=int, default=20, help="Synthetic users to create.")
+    parser.add_argument("--history", type=int, default=1000, help="Memory turns per user.")
+    parser.add_argument("--rows_per_section", type=int, default=5, help="Rows per profile table.")
+    parser.add_argument("--iterations", type=int, default=50, help="Measured requests.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests first.")
+    parser.add_argument("--new_tokens", type=int, default=32, help="Tokens generated per request.")
+    parser.add_argument("--tokenizer_dir", type=str, default=TOKENIZER_DIR)
+    parser.add_argument("--baseline", type=str, help="Baseline file to compare with or save to.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, e.g. 0.2 for 20%%.")
+    parser.add_argument("--save_baseline", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.save_baseline and args.baseline is None:
+        parser.error("--save_baseline needs --baseline")
+
+    # Every connection, including the pooled ones, works in the scratch schema
+    os.environ["PGOPTIONS"] = f"-c search_path={BENCHMARK_SCHEMA}"
+    from logic.utils import load_config
+    from logic.model_memory_logic import PROFILE_SECTIONS, close_connection_pool, connect_db
+    from generate_text import CONFIG_FILE
+
+    rng = random.Random(args.seed)
+    config = load_config(CONFIG_FILE)
+    conn = connect_db()
+    try:
+        create_schema(conn, PROFILE_SECTIONS)
+        seed_users(conn, PROFILE_SECTIONS, args.users, args.history, args.rows_per_section, rng)
+    finally:
+        conn.close()
+    tokenizer, model = load_tiny_model(args.tokenizer_dir)
+    try:
+        results = run_benchmark(args, config, tokenizer, model, args.users, rng)
+    finally:
+        close_connection_pool()
+
+    print(f"{'stage':<20}{'p50 ms':>12}{'p95 ms':>12}")
+    for stage, statistics in results.items():
+        print(f"{stage:<20}{statistics['p50']:>12.2f}{statistics['p95']:>12.2f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if args.baseline is None:
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; run with --save_baseline first.")
+        return
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# scripts/benchmark_assisted.py
+
+# Description: Decode speed of assisted generation against plain
+# model.generate. Both run greedily on the same prompts and generate the same
+# number of tokens, so the replies should match and only the speed differs.
+
+import argparse
+import time
+
+MODEL_DIR = "/home/ncacord/qRaphael/models/qRaphael-2b-it"
+
+PROMPTS = [
+    "Summarize what I spent on groceries last month and suggest a budget.",
+    "Write a short plan for a relaxing weekend with a walk in the park.",
+    "Explain how compound interest works using a simple example.",
+    "List a few quick dinner ideas that use rice and vegetables.",
+    "Give me three tips for sleeping better during a busy work week.",
+]
+
+
+def decode_rate(tokens, seconds):
+    return tokens / seconds if seconds > 0 else 0.0
+
+
+def run_prompts(model, tokenizer, prompts, new_tokens, assistant_model=None):
+    """
+    Generate a reply to every prompt.
+
+    Returns:
+    - list: (generated token ids, seconds, steps) per prompt.
+    """
+    import torch
+    from timed_streamer import TimedTextStreamer
+
+    assisted = {}
+    if assistant_model is not None:
+        assisted = {"assistant_model": assistant_model}
+    results = []
+    for prompt in prompts:
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        streamer = TimedTextStreamer(tokenizer, skip_prompt=True)
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                do_sample=False,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                streamer=streamer,
+                **assisted,
+            )
+        seconds = time.perf_counter() - start
+        results.append(
+            (outputs[0, inputs.input_ids.shape[1] :].tolist(), seconds, streamer.steps)
+        )
+    return results
+
+
+def main():
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from generate_text import CONFIG_FILE
+    from assisted_decoding import AcceptanceStats, load_assistant_model
+    from benchmark import percentile
+    from logic.utils import load_config
+
+    config = load_config(CONFIG_FILE)
+    parser = argparse.ArgumentParser(
+        description="Compare assisted generation with plain model.generate."
+    )
+    parser.add_argument("--model_dir", type=str, default=MODEL_DIR)
+    parser.add_argument("--assistant_dir", type=str, default=config["assistant_model"])
+    parser.add_argument("--num_assistant_tokens", type=int, default=config["num_assistant_tokens"])
+    parser.add_argument("--new_tokens", type=int, default=128, help="Tokens generated per prompt.")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the prompts.")
+    args = parser.parse_args()
+    if not args.assistant_dir:
+        parser.error("Set assistant_model in the config or pass --assistant_dir.")
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+    model = AutoModelForCausalLM.from_pretrained(
+        args.model_dir, torch_dtype="auto", low_cpu_mem_usage=True
+    )
+    model.eval()
+    assistant_model = load_assistant_model(
+        args.assistant_dir, "auto", args.num_assistant_tokens
+    )
+
+    # Warm up both paths before measuring
+    run_prompts(model, tokenizer, PROMPTS[:1], 8)
+    run_prompts(model, tokenizer, PROMPTS[:1], 8, assistant_model)
+
+    plain = []
+    assisted = []
+    for _ in range(args.repeats):
+        plain.extend(run_prompts(model, tokenizer, PROMPTS, args.new_tokens))
+        assisted.extend(
+            run_prompts(model, tokenizer, PROMPTS, args.new_tokens, assistant_model)
+        )
+
+    stats = AcceptanceStats()
+    for tokens, _, steps in assisted:
+        stats.record(steps, len(tokens), args.num_assistant_tokens)
+    plain_rates = [decode_rate(len(tokens), seconds) for tokens, seconds, _ in plain]
+    assisted_rates = [decode_rate(len(tokens), seconds) for tokens, seconds, _ in assisted]
+    matching = sum(a[0] == b[0] for a, b in zip(plain, assisted))
+
+    print(f"{'mode':<12}{'p50 tok/s':>12}{'p95 tok/s':>12}")
+    for mode, rates in (("plain", plain_rates), ("assisted", assisted_rates)):
+        print(f"{mode:<12}{percentile(rates, 0.5):>12.1f}{percentile(rates, 0.95):>12.1f}")
+    print(f"Speedup: {percentile(assisted_rates, 0.5) / percentile(plain_rates, 0.5):.2f}x")
+    print(f"Acceptance rate: {stats.stats()['acceptance_rate']:.2f}")
+    print(f"Identical replies: {matching}/{len(plain)}")
+
+
+if __name__ == "__main__":
+    main()
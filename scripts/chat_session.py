@@ -0,0 +1,332 @@
+# scripts/chat_session.py
+
+# Description: Chat sessions of the inference server. A session keeps one
+# user's conversation memory, builds the prompt from it and the user's
+# profile, and answers simple requests without the model.
+
+import logging
+import time
+from collections import deque
+from logic.text_chat_logic import get_followup_message
+from logic.utils import (
+    estimate_tokens,
+    handle_raphael_identity,
+    handle_suggestions,
+)
+from logic.model_memory_logic import (
+    fetch_memory_turns,
+    fetch_memory_summary,
+    fetch_memory_rows,
+    fetch_memory_texts,
+    save_user_memory,
+    fetch_user_profile,
+    fetch_user_preferences,
+    fetch_user_name,
+    update_user_name,
+)
+from logic.metrics import metrics
+from logic.profile_format import ProfileFormatter
+from logic.response_cache import response_key
+from prefix_cache import PrefixCache
+from token_buffer import TokenBuffer
+
+SECTION_CONFIG_FILE = "/home/ncacord/qRaphael/config/section_keywords.json"
+INTENT_CONFIG_FILE = "/home/ncacord/qRaphael/config/intents.json"
+MEMORY_INDEX_DIR = "/home/ncacord/qRaphael/data/memory_index/"
+RESPONSE_CACHE_FILE = "/home/ncacord/qRaphael/data/response_cache.sqlite3"
+
+# Profile sections in the order they are added to the prompt
+PROFILE_LABELS = [
+    ("details", "User Details"),
+    ("preferences", "User Preferences"),
+    ("medical", "User Medical"),
+    ("financial", "User Financial"),
+    ("professional", "User Professional"),
+    ("education", "User Education"),
+    ("social", "User Social"),
+    ("security", "User Security"),
+    ("miscellaneous", "User Miscellaneous"),
+    ("interests", "User Interests"),
+]
+
+logger = logging.getLogger(__name__)
+
+# Profile sections are rendered once per version of the cached section
+profile_formatter = ProfileFormatter()
+
+
+def window_memory(turns, token_budget, summary=""):
+    """
+    Join the summary of older turns and the most recent memory turns that fit
+    within a token budget.
+
+    Args:
+    - turns (iterable): Memory turns, oldest first.
+    - token_budget (int): Maximum estimated tokens for the joined memory.
+    - summary (str): Rolling summary of the turns before the window.
+
+    Returns:
+    - str: The summary followed by the selected turns, oldest first,
+      separated by newlines.
+    """
+    selected = []
+    used = estimate_tokens(summary)
+    for turn in reversed(turns):
+        used += estimate_tokens(turn) + 1
+        if used > token_budget:
+            break
+        selected.append(turn)
+    if summary:
+        selected.append(summary)
+    return "\n".join(reversed(selected))
+
+
+def build_prompt(prompt, user_memory, profile, related_memory=""):
+    """
+    Combine the user's memory, the profile sections and the prompt into the
+    text that is handed to the model. Sections missing from the profile or
+    holding nothing are left out.
+
+    The memory comes first, so the prefix cache covers the history up to the
+    previous turn. Everything after it is prefilled again on every turn: the
+    previous turn itself, which sat behind that turn's recalled memory,
+    profile and prompt, and this turn's recalled memory, profile and prompt.
+    Those change with the prompt, since they are selected for it.
+
+    Args:
+    - prompt (str): The prompt for this turn.
+    - user_memory (str): The conversation history for the user.
+    - profile (dict): The profile sections returned by fetch_user_profile.
+    - related_memory (str): Earlier turns recalled for this prompt. They
+      change from prompt to prompt, so they follow the stable history.
+
+    Returns:
+    - str: The combined prompt.
+    """
+    lines = [user_memory]
+    if related_memory:
+        lines.append(related_memory)
+    lines.extend(profile_formatter.format_profile(profile, PROFILE_LABELS))
+    lines.append(prompt)
+    return "\n".join(lines)
+
+
+class ChatSession:
+    """
+    A conversation with a single user. The session holds the user's memory
+    and turns prompts into replies, either by answering simple requests
+    directly or by asking the model with the profile sections relevant to
+    the prompt.
+
+    Args:
+    - user_id (str): Unique identifier for the user.
+    - generate (callable): Takes a combined prompt and yields the generated
+      text piece by piece. When the prefix cache or the token buffer is
+      enabled it is passed as `prefix_cache` or `token_buffer`.
+    - config (dict): The text generation parameters.
+    - section_router (SectionRouter): Selects the profile sections for a prompt.
+    - intent_router (IntentRouter): Recognizes requests answered without the
+      model.
+    - memory_index (MemoryIndex): Recalls earlier turns relevant to a prompt,
+      or None to use only the recent turns.
+    - memory_writer (MemoryWriter): Saves turns in the background, or None to
+      save them before the reply is returned.
+    - response_cache (ResponseCache): Replies to the intents listed in
+      config["response_cache_intents"] are reused from it, or None to always
+      generate.
+    """
+
+    def __init__(
+        self,
+        user_id,
+        generate,
+        config,
+        section_router,
+        intent_router,
+        memory_index=None,
+        memory_writer=None,
+        response_cache=None,
+    ):
+        self.user_id = user_id
+        self.generate = generate
+        self.config = config
+        self.section_router = section_router
+        self.intent_router = intent_router
+        self.intent_handlers = {
+            "identity": self.identity_reply,
+            "suggestions": self.suggestions_reply,
+            "set_name": self.set_name_reply,
+        }
+        self.memory_index = memory_index
+        self.memory_writer = memory_writer
+        self.response_cache = response_cache
+        if memory_index is not None:
+            # Index turns saved since the index was last updated
+            memory_index.add_many(
+                user_id, fetch_memory_rows(user_id, memory_index.last_id(user_id))
+            )
+        # Keeps the key/values of the last turn so the next one only
+        # prefills what changed
+        self.prefix_cache = PrefixCache() if config["prefix_cache"] else None
+        # Keeps the token ids of the last prompt's lines so the next one only
+        # tokenizes what changed
+        self.token_buffer = TokenBuffer() if config["token_buffer"] else None
+        self.memory_summary = fetch_memory_summary(user_id)
+        turns = fetch_memory_turns(user_id, limit=config["memory_turns"])
+        # Only the most recent turns are kept, so the prompt stays bounded
+        self.memory = deque(turns)
+        self.user_name = fetch_user_name(user_id)
+
+    def respond(self, prompt):
+        """
+        Produce a reply for a single prompt.
+
+        Args:
+        - prompt (str): The prompt provided by the user.
+
+        Returns:
+        - dict: The reply under "response" and the follow-up message under
+          "followup" (None when the model was not used).
+        """
+        for message in self.respond_stream(prompt):
+            pass
+        return message
+
+    def respond_stream(self, prompt):
+        """
+        Produce a reply for a single prompt, passing generated text on as soon
+        as it is available.
+
+        Args:
+        - prompt (str): The prompt provided by the user.
+
+        Yields:
+        - dict: {"chunk": text} for each piece of generated text, then the
+          complete reply as returned by respond().
+        """
+        # Simple requests are answered directly, before any model work
+        intent, fields = self.intent_router.match(prompt) or (None, {})
+        if intent in self.intent_handlers:
+            yield {"response": self.intent_handlers[intent](**fields), "followup": None}
+            return
+        sections = self.section_router.route(prompt)
+        if self.user_name:
+            prompt = f"{self.user_name}, {prompt}"
+        window_start = time.perf_counter()
+        user_memory = window_memory(
+            self.memory, self.config["memory_token_budget"], self.memory_summary
+        )
+        window_seconds = time.perf_counter() - window_start
+        # Only the sections relevant to this prompt are fetched and serialized
+        profile = fetch_user_profile(self.user_id, sections=sections)
+        cache_key = None
+        generated_text = None
+        if (
+            self.response_cache is not None
+            and intent in self.config["response_cache_intents"]
+        ):
+            cache_key = response_key(prompt, profile, self.config)
+            generated_text = self.response_cache.get(cache_key)
+        if generated_text is not None:
+            logger.info(f"Cached reply for prompt '{prompt}'")
+            yield {"chunk": generated_text}
+        else:
+            related_memory = self.related_memory(prompt)
+            build_start = time.perf_counter()
+            combined_prompt = build_prompt(prompt, user_memory, profile, related_memory)
+            # The database lookups in between are timed as db_fetch
+            metrics.observe(
+                "prompt_build", window_seconds + time.perf_counter() - build_start
+            )
+            options = {}
+            if self.prefix_cache is not None:
+                options["prefix_cache"] = self.prefix_cache
+            if self.token_buffer is not None:
+                options["token_buffer"] = self.token_buffer
+            chunks = self.generate(combined_prompt, **options)
+            generated = []
+            for chunk in chunks:
+                generated.append(chunk)
+                yield {"chunk": chunk}
+            generated_text = "".join(generated)
+            logger.info(f"Generated text for prompt '{prompt}': {generated_text}")
+            if cache_key is not None:
+                self.response_cache.put(cache_key, generated_text)
+        turn = prompt + "\n" + generated_text
+        self.remember(turn)
+        self.save_turn(turn)
+        yield {
+            "response": generated_text,
+            "followup": get_followup_message(prompt, generated_text),
+        }
+
+    def identity_reply(self):
+        return handle_raphael_identity()
+
+    def suggestions_reply(self):
+        return handle_suggestions(fetch_user_preferences(self.user_id))
+
+    def set_name_reply(self, name):
+        self.user_name = name
+        update_user_name(self.user_id, name)
+        return f"Nice to meet you, {name}!"
+
+    def save_turn(self, turn):
+        def index_turn(memory_id):
+            if self.memory_index is not None and memory_id is not None:
+                self.memory_index.add(self.user_id, memory_id, turn)
+
+        if self.memory_writer is not None:
+            self.memory_writer.submit(self.user_id, turn, on_saved=index_turn)
+        else:
+            with metrics.span("memory_save"):
+                memory_id = save_user_memory(self.user_id, turn)
+            index_turn(memory_id)
+
+    def related_memory(self, prompt):
+        """
+        Recall the earlier turns most relevant to a prompt, leaving out those
+        already in the recent memory window.
+
+        Returns:
+        - str: The recalled turns, oldest first, separated by newlines.
+        """
+        k = self.config["memory_retrieval_k"]
+        if self.memory_index is None or k <= 0:
+            return ""
+        # Over-fetch, since some matches are in the window already
+        memory_ids = self.memory_index.search(
+            self.user_id, prompt, k + len(self.memory)
+        )
+        if not memory_ids:
+            return ""
+        texts = fetch_memory_texts(self.user_id, memory_ids)
+        # A turn saved twice (e.g. a retried save) is recalled once
+        seen = set(self.memory)
+        selected = []
+        for memory_id in dict.fromkeys(memory_ids):
+            text = texts.get(memory_id)
+            if text is None or text in seen:
+                continue
+            seen.add(text)
+            selected.append(memory_id)
+            if len(selected) == k:
+                break
+        return "\n".join(texts[memory_id] for memory_id in sorted(selected))
+
+    def remember(self, turn):
+        self.memory.append(turn)
+        max_turns = self.config["memory_turns"]
+        budget = self.config["memory_token_budget"]
+        if len(self.memory) <= max_turns and self.memory_tokens() <= budget:
+            return
+        # Old turns are dropped in chunks rather than one per turn, so the
+        # start of the prompt (and the prefix cache) stays the same for
+        # several turns in a row
+        while len(self.memory) > 1 and (
+            len(self.memory) > max_turns // 2 or self.memory_tokens() > budget // 2
+        ):
+            self.memory.popleft()
+
+    def memory_tokens(self):
+        return sum(estimate_tokens(turn) + 1 for turn in self.memory)
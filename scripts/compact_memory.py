@@ -0,0 +1,37 @@
+# scripts/compact_memory.py
+
+# Description: Batch job running a single memory compaction pass over all
+# users. The inference server does the same periodically in the background;
+# this is for nodes where no server is running, e.g. from cron.
+
+import logging
+from logic.utils import load_config
+from logic.memory_compaction import compact_all_users, summary_config
+from logic.model_memory_logic import close_connection_pool
+from generation import generate_text
+from model_loader import CONFIG_FILE, MODEL_SAVE_DIR, load_model_and_tokenizer
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    config = load_config(CONFIG_FILE)
+    tokenizer, model = load_model_and_tokenizer(
+        MODEL_SAVE_DIR, config["model_dtype"], config["cpu_int8"]
+    )
+    generation_config = summary_config(config)
+
+    def summarize(prompt):
+        return generate_text(prompt, model, tokenizer, generation_config)
+
+    try:
+        compacted = compact_all_users(
+            summarize, config["memory_turns"], config["compaction_batch_turns"]
+        )
+        logger.info(f"Compacted {compacted} memory turns")
+    finally:
+        close_connection_pool()
+
+
+if __name__ == "__main__":
+    main()
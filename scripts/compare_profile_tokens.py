@@ -0,0 +1,81 @@
+# scripts/compare_profile_tokens.py
+
+# Description: Counts the prompt tokens a user's profile takes in the compact
+# format used by build_prompt and in the JSON form it replaced, per section
+# and in total.
+
+import argparse
+import json
+
+TOKENIZER_DIR = "/home/ncacord/qRaphael/models/qRaphael-2b-it"
+
+
+def json_profile_lines(profile, labels):
+    """
+    The profile as build_prompt used to render it: one JSON line per section.
+    """
+    return [
+        f"{label}: {json.dumps(profile[key], default=str)}"
+        for key, label in labels
+        if key in profile
+    ]
+
+
+def compare_profile(profile, labels, count_tokens):
+    """
+    Count the tokens of each section in both forms.
+
+    Args:
+    - profile (dict): The profile sections returned by fetch_user_profile.
+    - labels (list): (key, label) pairs in prompt order.
+    - count_tokens (callable): Returns the number of tokens in a text.
+
+    Returns:
+    - list: (label, JSON tokens, compact tokens) per section.
+    """
+    from logic.profile_format import format_section
+
+    rows = []
+    for key, label in labels:
+        if key not in profile:
+            continue
+        json_text = "\n".join(json_profile_lines(profile, [(key, label)]))
+        compact_text = "\n".join(format_section(label, profile[key]))
+        rows.append((label, count_tokens(json_text), count_tokens(compact_text)))
+    return rows
+
+
+def main():
+    from transformers import AutoTokenizer
+    from chat_session import PROFILE_LABELS
+    from logic.model_memory_logic import close_connection_pool, fetch_user_profile
+
+    parser = argparse.ArgumentParser(
+        description="Compare the prompt tokens of the JSON and compact profile forms."
+    )
+    parser.add_argument("--user_id", action="append", required=True, help="User to compare; repeatable.")
+    parser.add_argument("--tokenizer_dir", type=str, default=TOKENIZER_DIR)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer_dir)
+
+    def count_tokens(text):
+        return len(tokenizer(text, add_special_tokens=False).input_ids) if text else 0
+
+    try:
+        for user_id in args.user_id:
+            rows = compare_profile(fetch_user_profile(user_id), PROFILE_LABELS, count_tokens)
+            print(f"User {user_id}")
+            print(f"{'section':<24}{'json':>8}{'compact':>10}")
+            for label, json_tokens, compact_tokens in rows:
+                print(f"{label:<24}{json_tokens:>8}{compact_tokens:>10}")
+            json_total = sum(row[1] for row in rows)
+            compact_total = sum(row[2] for row in rows)
+            saved = 1 - compact_total / json_total if json_total else 0.0
+            print(f"{'total':<24}{json_total:>8}{compact_total:>10}  ({saved:.0%} fewer)")
+    finally:
+        close_connection_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# scripts/cpu_int8.py
+
+# Description: The int8 CPU variant of the model. Its Linear layers are
+# quantized with PyTorch dynamic quantization, which save_pretrained cannot
+# store, so the quantized state dict is saved with the model's config and the
+# model is rebuilt and quantized the same way before the weights are loaded.
+# Nothing is unpickled beyond tensors.
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Written by save_quantized_model.py --mode cpu-int8 inside the model directory
+CPU_INT8_DIR = "cpu-int8"
+STATE_DICT_FILE = "model_int8_state_dict.pt"
+
+
+def quantize(model):
+    """
+    Quantize a float32 model's Linear layers to int8 weights. Activations are
+    quantized on the fly, so no GPU is needed.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def use_cpu_int8(model_dir, enabled, cuda_available):
+    """
+    Decide whether to load the int8 CPU variant instead of the checkpoint.
+
+    Args:
+    - model_dir (str): The model directory.
+    - enabled (bool): The "cpu_int8" config value. The variant is never
+      loaded unless it is set.
+    - cuda_available (bool): Whether a GPU is available.
+
+    Returns:
+    - bool: True to load the int8 CPU variant.
+    """
+    if not enabled:
+        return False
+    if cuda_available:
+        logger.warning("cpu_int8 is set but CUDA is available; loading the regular checkpoint")
+        return False
+    if not os.path.exists(os.path.join(model_dir, CPU_INT8_DIR, STATE_DICT_FILE)):
+        raise FileNotFoundError(
+            f"cpu_int8 is set but {model_dir} has no {CPU_INT8_DIR}/{STATE_DICT_FILE}; "
+            "create it with save_quantized_model.py --mode cpu-int8"
+        )
+    return True
+
+
+def save_cpu_int8(model, model_dir):
+    """
+    Save a model quantized with quantize() where load_cpu_int8() finds it.
+
+    Args:
+    - model: The quantized model.
+    - model_dir (str): The model directory.
+    """
+    import torch
+
+    directory = os.path.join(model_dir, CPU_INT8_DIR)
+    os.makedirs(directory, exist_ok=True)
+    # Kept apart from the checkpoint's config.json, which may carry another
+    # quantization setup
+    model.config.save_pretrained(directory)
+    torch.save(model.state_dict(), os.path.join(directory, STATE_DICT_FILE))
+
+
+def load_cpu_int8(model_dir):
+    """
+    Rebuild the int8 CPU variant saved by save_cpu_int8().
+
+    Args:
+    - model_dir (str): The model directory.
+
+    Returns:
+    - The quantized model, in eval mode.
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    directory = os.path.join(model_dir, CPU_INT8_DIR)
+    config = AutoConfig.from_pretrained(directory)
+    model = quantize(AutoModelForCausalLM.from_config(config, torch_dtype=torch.float32))
+    state_dict = torch.load(os.path.join(directory, STATE_DICT_FILE), weights_only=True)
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model
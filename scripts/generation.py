@@ -0,0 +1,262 @@
+# scripts/generation.py
+
+# Description: Text generation with the loaded model, shared by the inference
+# server's batch scheduler, the stopping criteria and the batch jobs. The
+# reply is streamed one sentence at a time.
+
+import logging
+import threading
+import time
+from logic.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Replies are cut after the last of these
+END_PUNCTUATION = (".", "!", "?")
+
+
+class SentenceBuffer:
+    """
+    Holds back generated text until a sentence end, so replies are passed on
+    one sentence at a time and anything after the last sentence end is
+    dropped. A reply without any sentence end is passed on whole by flush().
+    Text from the first stop string on is dropped as well.
+
+    Args:
+    - stop_strings (list): Strings that end the reply.
+    """
+
+    def __init__(self, stop_strings=()):
+        self.stop_strings = stop_strings
+        self.pending = ""
+        self.emitted = False
+        self.stopped = False
+        # Time spent cutting the text, recorded as the "truncation" stage
+        self.seconds = 0.0
+
+    def feed(self, text):
+        start = time.perf_counter()
+        try:
+            return self.cut(text)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def cut(self, text):
+        if self.stopped:
+            return ""
+        self.pending += text
+        for stop in self.stop_strings:
+            index = self.pending.find(stop)
+            if index >= 0:
+                self.pending = self.pending[:index]
+                self.stopped = True
+        end = max(self.pending.rfind(punct) for punct in END_PUNCTUATION)
+        if end < 0:
+            return ""
+        ready, self.pending = self.pending[: end + 1], self.pending[end + 1 :]
+        self.emitted = True
+        return ready
+
+    def flush(self):
+        metrics.observe("truncation", self.seconds)
+        return "" if self.emitted else self.pending
+
+
+def log_generation_stats(
+    prompt_tokens, new_tokens, start_time, first_token_time, prefill_start=None, end_time=None
+):
+    # Rows of a batch end at their own time, not at the end of the batch
+    if end_time is None:
+        end_time = time.perf_counter()
+    if first_token_time is None:
+        first_token_time = end_time
+    decode_time = end_time - first_token_time
+    # Prefill runs from the end of tokenization to the first token
+    metrics.observe("prefill", first_token_time - (prefill_start or start_time))
+    metrics.observe("decode", decode_time)
+    # The first token is part of the time to first token, not of decoding
+    tokens_per_second = max(new_tokens - 1, 0) / decode_time if decode_time > 0 else 0.0
+    logger.info(
+        f"Generated {new_tokens} tokens from {prompt_tokens} prompt tokens, "
+        f"time to first token {first_token_time - start_time:.3f}s, "
+        f"{tokens_per_second:.1f} tokens/s"
+    )
+
+
+def encode_prompts(tokenizer, prompts, token_buffers=None):
+    """
+    Tokenize prompts into a left-padded batch. Prompts with a token buffer
+    only tokenize their new lines.
+
+    Args:
+    - tokenizer: The loaded tokenizer.
+    - prompts (list): The full model inputs.
+    - token_buffers (list): The TokenBuffer, or None, for each prompt.
+
+    Returns:
+    - BatchEncoding: input_ids and attention_mask tensors on the model's
+      device.
+    """
+    import torch
+    from transformers import BatchEncoding
+
+    if token_buffers is None or all(buffer is None for buffer in token_buffers):
+        # A single prompt needs no padding, nor a pad token
+        encoded = tokenizer(prompts, padding=len(prompts) > 1, return_tensors="pt")
+    else:
+        ids = [
+            buffer.encode(tokenizer, prompt)
+            if buffer is not None
+            else tokenizer(prompt).input_ids
+            for prompt, buffer in zip(prompts, token_buffers)
+        ]
+        width = max(len(row) for row in ids)
+        encoded = BatchEncoding(
+            {
+                "input_ids": [
+                    [tokenizer.pad_token_id] * (width - len(row)) + row for row in ids
+                ],
+                "attention_mask": [
+                    [0] * (width - len(row)) + [1] * len(row) for row in ids
+                ],
+            },
+            tensor_type="pt",
+        )
+    return encoded.to("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def stream_text(
+    combined_prompt,
+    model,
+    tokenizer,
+    config,
+    prefix_cache=None,
+    assistant_model=None,
+    token_buffer=None,
+):
+    """
+    Generate a reply and yield it as it is produced, one sentence at a time
+    (see SentenceBuffer).
+
+    Args:
+    - combined_prompt (str): The full model input.
+    - model: The loaded model.
+    - tokenizer: The loaded tokenizer.
+    - config (dict): The text generation parameters.
+    - prefix_cache (PrefixCache): The session's prefix cache, if any.
+    - assistant_model: Draft model for assisted decoding, if any.
+    - token_buffer (TokenBuffer): The session's token buffer, if any.
+
+    Yields:
+    - str: The next piece of the reply.
+    """
+    from transformers import StoppingCriteriaList
+    from assisted_decoding import acceptance
+    from stopping_criteria import SentenceStopping
+    from timed_streamer import TimedTextStreamer
+
+    start_time = time.perf_counter()
+    with metrics.span("tokenize"):
+        inputs = encode_prompts(tokenizer, [combined_prompt], [token_buffer])
+    # Reuse the key/values of the prefix shared with the session's last turn
+    past_key_values = None
+    if prefix_cache is not None:
+        past_key_values = prefix_cache.reuse(inputs.input_ids[0].tolist())
+        logger.info(
+            f"Prefix cache reused {prefix_cache.reused_tokens} of "
+            f"{inputs.input_ids.shape[1]} prompt tokens"
+        )
+    prefill_start = time.perf_counter()
+    # max_new_tokens, when set, bounds the reply regardless of prompt length
+    if "max_new_tokens" in config:
+        length = {"max_new_tokens": config["max_new_tokens"]}
+    else:
+        length = {"max_length": config["max_length"]}
+    # End at a sentence boundary or stop string rather than at the limit
+    stopping = SentenceStopping.from_configs(
+        tokenizer, inputs.input_ids.shape[1], [config]
+    )
+    streamer = TimedTextStreamer(
+        tokenizer, skip_prompt=True, skip_special_tokens=True
+    )
+    result = {}
+    # The draft model proposes tokens the model verifies in one pass
+    assisted = {}
+    if assistant_model is not None:
+        assisted = {"assistant_model": assistant_model}
+
+    def run_generate():
+        try:
+            result["outputs"] = model.generate(
+                inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                past_key_values=past_key_values,
+                return_dict_in_generate=True,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([stopping] if stopping else []),
+                **length,
+                max_time=config["max_time"],
+                do_sample=config["do_sample"],
+                temperature=config["temperature"],
+                top_k=config["top_k"],
+                top_p=config["top_p"],
+                repetition_penalty=config["repetition_penalty"],
+                **assisted,
+            )
+        except Exception as e:
+            result["error"] = e
+            streamer.end()
+
+    thread = threading.Thread(target=run_generate, daemon=True)
+    thread.start()
+    sentences = SentenceBuffer(config.get("stop_strings", ()))
+    for text in streamer:
+        ready = sentences.feed(text)
+        if ready:
+            yield ready
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    rest = sentences.flush()
+    if rest:
+        yield rest
+
+    sequence = result["outputs"].sequences[0]
+    if prefix_cache is not None:
+        prefix_cache.store(sequence.tolist(), result["outputs"].past_key_values)
+    log_generation_stats(
+        inputs.input_ids.shape[1],
+        len(sequence) - inputs.input_ids.shape[1],
+        start_time,
+        streamer.first_token_time,
+        prefill_start,
+    )
+    if assistant_model is not None:
+        rate = acceptance.record(
+            streamer.steps,
+            streamer.tokens,
+            assistant_model.generation_config.num_assistant_tokens,
+        )
+        logger.info(f"Assistant acceptance rate {rate:.2f} over {streamer.steps} steps")
+
+
+def generate_text(
+    combined_prompt,
+    model,
+    tokenizer,
+    config,
+    prefix_cache=None,
+    assistant_model=None,
+    token_buffer=None,
+):
+    return "".join(
+        stream_text(
+            combined_prompt,
+            model,
+            tokenizer,
+            config,
+            prefix_cache,
+            assistant_model,
+            token_buffer,
+        )
+    )
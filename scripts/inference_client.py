@@ -0,0 +1,213 @@
+# scripts/inference_client.py
+
+# Description: Client for the inference server started by model_loader.py.
+# Requests and responses are exchanged as one JSON object per line over a
+# local Unix socket.
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+SOCKET_PATH = os.getenv(
+    "INFERENCE_SOCKET", "/home/ncacord/qRaphael/run/inference.sock"
+)
+
+
+class InferenceServerError(Exception):
+    """Raised when the inference server reports a failed request."""
+
+
+class InferenceClient:
+    """
+    Connection to a running inference server. The socket is opened on the
+    first request and reused for the rest of the client's lifetime.
+
+    Args:
+    - socket_path (str): Path of the server's Unix socket.
+    - timeout (float): Socket timeout in seconds, or None to wait forever.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+        self.stream = self.sock.makefile("rwb")
+
+    def request(self, payload):
+        """
+        Send a single request and wait for its response.
+
+        Args:
+        - payload (dict): The request, including its "action".
+
+        Returns:
+        - dict: The decoded response.
+        """
+        if self.sock is None:
+            self.connect()
+        self.stream.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            self.close()
+            raise ConnectionError("Inference server closed the connection.")
+        response = json.loads(line)
+        if response.get("status") != "ok":
+            raise InferenceServerError(response.get("error", "Unknown error"))
+        return response
+
+    def stream_request(self, payload):
+        """
+        Send a streaming request and yield its response messages until the
+        final one, which carries the "response" key.
+
+        Args:
+        - payload (dict): The request, including its "action".
+
+        Yields:
+        - dict: The decoded messages.
+        """
+        if self.sock is None:
+            self.connect()
+        self.stream.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self.stream.flush()
+        while True:
+            line = self.stream.readline()
+            if not line:
+                self.close()
+                raise ConnectionError("Inference server closed the connection.")
+            message = json.loads(line)
+            if message.get("status") != "ok":
+                raise InferenceServerError(message.get("error", "Unknown error"))
+            yield message
+            if "response" in message:
+                return
+
+    def ping(self):
+        return self.request({"action": "ping"})
+
+    def wait_until_ready(self, timeout, interval=0.2, pid=None):
+        """
+        Wait for the server to answer a ping. The server only listens once
+        its model is loaded, so an answer means it is ready for requests.
+
+        Args:
+        - timeout (float): Seconds to wait at most.
+        - interval (float): Seconds between attempts.
+        - pid (int): Process id of the server; waiting stops early if it exits.
+
+        Returns:
+        - bool: True once the server answered, False on timeout or exit.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.ping()
+                return True
+            except (OSError, InferenceServerError):
+                self.close()
+            if pid is not None and not process_alive(pid):
+                return False
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def chat(self, session_id, user_id, prompt):
+        """
+        Ask the server to answer a prompt within a session. The session is
+        created on the server the first time its id is seen.
+
+        Args:
+        - session_id (str): Identifier for the conversation.
+        - user_id (str): Unique identifier for the user.
+        - prompt (str): The prompt provided by the user.
+
+        Returns:
+        - dict: The reply under "response" and the follow-up under "followup".
+        """
+        return self.request(
+            {
+                "action": "chat",
+                "session_id": session_id,
+                "user_id": user_id,
+                "prompt": prompt,
+            }
+        )
+
+    def chat_stream(self, session_id, user_id, prompt):
+        """
+        Like chat(), but yields {"chunk": text} messages while the reply is
+        generated, followed by the complete reply.
+        """
+        return self.stream_request(
+            {
+                "action": "chat",
+                "session_id": session_id,
+                "user_id": user_id,
+                "prompt": prompt,
+                "stream": True,
+            }
+        )
+
+    def metrics(self, format="json"):
+        """
+        Fetch the server's latency histograms and gauges.
+
+        Args:
+        - format (str): "json" for a dict, "prometheus" for the Prometheus
+          text format.
+
+        Returns:
+        - The metrics.
+        """
+        return self.request({"action": "metrics", "format": format})["metrics"]
+
+    def close_session(self, session_id):
+        return self.request({"action": "close_session", "session_id": session_id})
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Wait until the inference server is ready for requests."
+    )
+    parser.add_argument("--wait", type=float, default=120, help="Seconds to wait at most.")
+    parser.add_argument("--pid", type=int, help="Stop waiting if this process exits.")
+    args = parser.parse_args()
+    # A hung server must not block the caller past its own timeout
+    client = InferenceClient(timeout=5)
+    try:
+        ready = client.wait_until_ready(args.wait, pid=args.pid)
+    finally:
+        client.close()
+    sys.exit(0 if ready else 1)
+
+
+if __name__ == "__main__":
+    main()
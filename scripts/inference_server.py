@@ -0,0 +1,237 @@
+# scripts/inference_server.py
+
+# Description: Long-lived inference server. It owns the loaded model and
+# tokenizer and answers chat requests from thin clients over a Unix socket,
+# so every prompt is served by an already warm model.
+
+import json
+import logging
+import os
+import socketserver
+import threading
+from assisted_decoding import acceptance
+from batching import BatchScheduler
+from chat_session import (
+    ChatSession,
+    INTENT_CONFIG_FILE,
+    MEMORY_INDEX_DIR,
+    RESPONSE_CACHE_FILE,
+    SECTION_CONFIG_FILE,
+)
+from logic.intent_router import load_intent_router
+from logic.memory_compaction import summary_config
+from logic.memory_index import MemoryIndex
+from logic.memory_writer import MemoryWriter
+from logic.metrics import metrics
+from logic.model_memory_logic import PROFILE_SECTIONS
+from logic.response_cache import ResponseCache
+from logic.section_router import load_section_router
+from prefix_cache import reuse_stats
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one client connection. Each line received is a JSON request and
+    is answered with exactly one JSON response line. The sessions a
+    connection chats in are closed when it ends, so a client that goes away
+    without closing them does not leave them on the server.
+    """
+
+    def setup(self):
+        super().setup()
+        self.session_ids = set()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get("action") == "chat":
+                    self.session_ids.add(request.get("session_id"))
+                if request.get("stream"):
+                    # Streaming requests are answered with several lines
+                    for message in self.server.dispatch_stream(request):
+                        self.send(dict(message, status="ok"))
+                    continue
+                response = self.server.dispatch(request)
+                response["status"] = "ok"
+            except Exception as e:
+                logger.exception("Error handling request")
+                response = {"status": "error", "error": str(e)}
+            self.send(response)
+
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def finish(self):
+        try:
+            for session_id in self.session_ids:
+                self.server.close_session(session_id)
+        finally:
+            super().finish()
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server holding the model and the open chat sessions.
+
+    Args:
+    - socket_path (str): Path to bind the Unix socket to.
+    - tokenizer: The loaded tokenizer.
+    - model: The loaded model.
+    - config (dict): The text generation parameters.
+    - listen_socket (socket.socket): An already listening socket to accept
+      connections from, shared with other workers. The server binds its own
+      socket when this is None.
+    - assistant_model: Draft model for assisted decoding, if any.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, socket_path, tokenizer, model, config, listen_socket=None, assistant_model=None
+    ):
+        if listen_socket is None:
+            os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            super().__init__(socket_path, InferenceRequestHandler)
+        else:
+            super().__init__(socket_path, InferenceRequestHandler, bind_and_activate=False)
+            self.socket.close()
+            self.socket = listen_socket
+        # Whoever bound the socket removes it again
+        self.owns_socket = listen_socket is None
+        self.socket_path = socket_path
+        self.tokenizer = tokenizer
+        self.model = model
+        self.config = config
+        self.section_router = load_section_router(SECTION_CONFIG_FILE, PROFILE_SECTIONS)
+        self.intent_router = load_intent_router(INTENT_CONFIG_FILE)
+        # Shared by all sessions, so a user's turns are indexed once
+        self.memory_index = None
+        if config["memory_retrieval_k"] > 0:
+            self.memory_index = MemoryIndex(MEMORY_INDEX_DIR, config["memory_index_dim"])
+        # All generation goes through the scheduler, which batches requests
+        # that arrive close together
+        self.scheduler = BatchScheduler(
+            model,
+            tokenizer,
+            config["max_batch_size"],
+            config["batch_window"],
+            assistant_model,
+        )
+        self.scheduler.start()
+        # Replies are only cached for the intents that opt in
+        self.response_cache = None
+        if config["response_cache_intents"]:
+            os.makedirs(os.path.dirname(RESPONSE_CACHE_FILE), exist_ok=True)
+            self.response_cache = ResponseCache(
+                RESPONSE_CACHE_FILE,
+                config["response_cache_size"],
+                config["response_cache_ttl"],
+            )
+        # Memory turns are saved in the background, off the reply path
+        self.memory_writer = MemoryWriter(
+            config["memory_write_queue"], config["memory_write_batch"]
+        )
+        self.memory_writer.start()
+        if self.response_cache is not None:
+            metrics.register_gauges("response_cache", self.response_cache.stats)
+        if assistant_model is not None:
+            metrics.register_gauges("assistant", acceptance.stats)
+        if config["prefix_cache"]:
+            metrics.register_gauges("prefix_cache", reuse_stats.stats)
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        metrics.register_gauges("server", lambda: {"sessions": len(self.sessions)})
+
+    def generate(self, combined_prompt, config=None, prefix_cache=None, token_buffer=None):
+        request = self.scheduler.submit(
+            combined_prompt, config or self.config, prefix_cache, token_buffer
+        )
+        yield from request.stream()
+
+    def summarize(self, prompt):
+        return "".join(self.generate(prompt, summary_config(self.config)))
+
+    def get_session(self, session_id, user_id):
+        with self.sessions_lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            # Load the user's data outside the lock so other sessions are not held up
+            logger.info(f"Opening session {session_id} for user {user_id}")
+            session = ChatSession(
+                user_id,
+                self.generate,
+                self.config,
+                self.section_router,
+                self.intent_router,
+                self.memory_index,
+                self.memory_writer,
+                self.response_cache,
+            )
+            with self.sessions_lock:
+                self.sessions[session_id] = session
+        return session
+
+    def close_session(self, session_id):
+        with self.sessions_lock:
+            if self.sessions.pop(session_id, None) is not None:
+                logger.info(f"Closing session {session_id}")
+
+    def dispatch(self, request):
+        """
+        Run a single request.
+
+        Args:
+        - request (dict): The decoded request.
+
+        Returns:
+        - dict: The response payload.
+        """
+        action = request.get("action")
+        if action == "ping":
+            return {}
+        if action == "chat":
+            session = self.get_session(request["session_id"], request["user_id"])
+            return session.respond(request["prompt"])
+        if action == "close_session":
+            self.close_session(request["session_id"])
+            return {}
+        if action == "metrics":
+            if request.get("format") == "prometheus":
+                return {"metrics": metrics.prometheus()}
+            return {"metrics": metrics.snapshot()}
+        raise ValueError(f"Unknown action: {action}")
+
+    def dispatch_stream(self, request):
+        """
+        Run a streaming request.
+
+        Args:
+        - request (dict): The decoded request.
+
+        Yields:
+        - dict: The response messages, the last one carrying "response".
+        """
+        if request.get("action") != "chat":
+            raise ValueError(f"Streaming is not supported for {request.get('action')}")
+        session = self.get_session(request["session_id"], request["user_id"])
+        yield from session.respond_stream(request["prompt"])
+
+    def server_close(self):
+        with self.sessions_lock:
+            self.sessions.clear()
+        self.scheduler.stop()
+        # Save the turns still queued before the connection pool is closed
+        self.memory_writer.stop()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        super().server_close()
+        if self.owns_socket and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -4,19 +4,29 @@ import logging
 import os
 import signal
 import sys
+import time
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 from dotenv import load_dotenv
-import model_storage  # Import the model storage module
-
-# Suppress TensorFlow warnings and errors
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+from logic.utils import load_config
+from logic.model_memory_logic import close_connection_pool
+from logic.memory_compaction import MemoryCompactor
+from logic.metrics import MetricsLogger, metrics
+from inference_client import SOCKET_PATH
+from assisted_decoding import load_assistant_model
+from cpu_int8 import load_cpu_int8, use_cpu_int8
+from inference_server import InferenceServer
+from prefork import bind_socket, run_workers
+
+# Keep transformers from looking for TensorFlow; only torch is used
+os.environ.setdefault("USE_TF", "0")
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Define constants
 MODEL_SAVE_DIR = "/home/ncacord/qRaphael/models/qRaphael-2b-it"
+CONFIG_FILE = "/home/ncacord/qRaphael/config/text_gen_config.json"
 LOG_DIR = "/home/ncacord/qRaphael/logs/standard/"
 LOG_FILE = os.path.join(LOG_DIR, "model_loader_logs.log")
 
@@ -30,36 +40,156 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def load_model_and_tokenizer(model_dir):
+def resolve_dtype(name):
+    """
+    Map the "model_dtype" config value to what from_pretrained expects.
+
+    Args:
+    - name (str): "auto" for the dtype the checkpoint was saved in, or a torch
+      dtype name such as "bfloat16" or "float32".
+
+    Returns:
+    - The dtype argument for from_pretrained.
+    """
+    if name == "auto":
+        return "auto"
+    dtype = getattr(torch, name, None)
+    if not isinstance(dtype, torch.dtype):
+        raise ValueError(f"Unknown model_dtype: {name}")
+    return dtype
+
+
+def load_model_and_tokenizer(model_dir, dtype="auto", cpu_int8=False):
     logger.info("Loading tokenizer...")
     tokenizer = AutoTokenizer.from_pretrained(model_dir)
 
+    # The int8 CPU variant is only loaded when the config asks for it
+    if use_cpu_int8(model_dir, cpu_int8, torch.cuda.is_available()):
+        logger.info("Loading CPU int8 quantized model...")
+        start = time.perf_counter()
+        model = load_cpu_int8(model_dir)
+        logger.info(f"Model loaded in {time.perf_counter() - start:.1f}s")
+        return tokenizer, model
+
     logger.info("Loading model...")
-    model = AutoModelForCausalLM.from_pretrained(model_dir)
+    start = time.perf_counter()
+    # safetensors checkpoints are memory-mapped, and low_cpu_mem_usage builds
+    # the model without random initialization or a second copy of the weights
+    has_safetensors = any(name.endswith(".safetensors") for name in os.listdir(model_dir))
+    model = AutoModelForCausalLM.from_pretrained(
+        model_dir,
+        torch_dtype=resolve_dtype(dtype),
+        low_cpu_mem_usage=True,
+        use_safetensors=True if has_safetensors else None,
+    )
+    model.eval()
+    logger.info(f"Model loaded in {time.perf_counter() - start:.1f}s")
 
     return tokenizer, model
 
 
 def signal_handler(sig, frame):
     logger.info("Received termination signal. Shutting down gracefully...")
-    # Perform any necessary cleanup here
+    # Raising SystemExit stops serve_forever and runs the cleanup below
     sys.exit(0)
 
 
+def serve(
+    tokenizer,
+    model,
+    config,
+    listen_socket=None,
+    run_compactor=True,
+    assistant_model=None,
+    worker=None,
+):
+    """
+    Serve generation requests with the loaded model until we are stopped.
+
+    Args:
+    - tokenizer: The loaded tokenizer.
+    - model: The loaded model.
+    - config (dict): The text generation parameters.
+    - listen_socket (socket.socket): Listening socket shared by the workers,
+      or None to bind SOCKET_PATH.
+    - run_compactor (bool): Whether this process runs memory compaction.
+    - assistant_model: Draft model for assisted decoding, if any.
+    - worker (int): Index of this pre-fork worker, if any. Each worker keeps
+      its own metrics, so they are labelled with it.
+    """
+    if worker is not None:
+        metrics.set_labels(worker=worker)
+    server = InferenceServer(
+        SOCKET_PATH, tokenizer, model, config, listen_socket, assistant_model
+    )
+    logger.info(f"Inference server listening on {SOCKET_PATH}")
+
+    # Summarize old memory turns in the background while the server runs
+    compactor = MemoryCompactor(
+        server.summarize,
+        config["memory_turns"],
+        config["compaction_batch_turns"],
+        config["compaction_interval"],
+    )
+    if run_compactor and config["compaction_interval"] > 0:
+        compactor.start()
+
+    # Optionally write the stage latencies to the log as well
+    metrics_logger = MetricsLogger(metrics, config["metrics_log_interval"])
+    if config["metrics_log_interval"] > 0:
+        metrics_logger.start()
+
+    try:
+        server.serve_forever()
+    finally:
+        compactor.stop()
+        metrics_logger.stop()
+        server.server_close()
+        close_connection_pool()
+
+
 if __name__ == "__main__":
     logger.info("Starting model loader...")
-    model_storage.tokenizer, model_storage.model = load_model_and_tokenizer(
-        MODEL_SAVE_DIR
+    config = load_config(CONFIG_FILE)
+    tokenizer, model = load_model_and_tokenizer(
+        MODEL_SAVE_DIR, config["model_dtype"], config["cpu_int8"]
     )
+    assistant_model = None
+    if config["assistant_model"]:
+        assistant_model = load_assistant_model(
+            config["assistant_model"],
+            resolve_dtype(config["model_dtype"]),
+            config["num_assistant_tokens"],
+        )
     logger.info("Model and tokenizer loaded successfully.")
 
     # Setting up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    # Keeping the script running to keep the model loaded
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        logger.info("Model loader script stopped.")
+    # The socket only exists once the model is loaded, so clients wait for a
+    # ping to succeed (inference_client.py --wait) to know the server is ready.
+    if config["workers"] > 1:
+        # Workers share the weights loaded above and one listening socket;
+        # only the first one runs memory compaction
+        listen_socket = bind_socket(SOCKET_PATH)
+        try:
+            run_workers(
+                config["workers"],
+                lambda index: serve(
+                    tokenizer,
+                    model,
+                    config,
+                    listen_socket,
+                    index == 0,
+                    assistant_model,
+                    worker=index,
+                ),
+            )
+        finally:
+            listen_socket.close()
+            if os.path.exists(SOCKET_PATH):
+                os.unlink(SOCKET_PATH)
+    else:
+        serve(tokenizer, model, config, assistant_model=assistant_model)
+    logger.info("Model loader script stopped.")
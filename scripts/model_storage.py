@@ -1,4 +0,0 @@
-# model_storage.py
-
-tokenizer = None
-model = None
@@ -0,0 +1,129 @@
+# scripts/prefix_cache.py
+
+# Description: Per-session cache of the model's key/value states, so a new
+# turn only has to prefill the tokens that differ from the previous one.
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixCache:
+    """
+    The token ids of the last sequence a session generated together with the
+    key/value cache the model built for them. On the next turn the longest
+    common prefix with the new input is reused and only the rest is
+    prefilled.
+
+    The new input rarely extends the whole cached sequence, so the cache has
+    to be cropped to the common prefix. Caches without crop() (e.g. the
+    HybridCache older transformers versions use for Gemma-2) or that refuse
+    to crop (sliding window layers past their window) are never reused, and
+    are not kept either.
+    """
+
+    def __init__(self):
+        self.token_ids = []
+        self.past_key_values = None
+        # Prompt tokens covered by the cache handed out by the last reuse()
+        self.reused_tokens = 0
+
+    def reuse(self, token_ids):
+        """
+        Take the cached key/values that can be reused for a new input.
+
+        The cache is handed over to the caller, since generation extends it in
+        place; store() must be called with the updated cache afterwards.
+
+        Args:
+        - token_ids (list): Token ids of the new input.
+
+        Returns:
+        - The key/value cache covering the common prefix, or None when nothing
+          can be reused.
+        """
+        past_key_values, self.past_key_values = self.past_key_values, None
+        self.reused_tokens = self.match(token_ids, past_key_values)
+        reuse_stats.record(len(token_ids), self.reused_tokens)
+        return past_key_values if self.reused_tokens else None
+
+    def match(self, token_ids, past_key_values):
+        if past_key_values is None:
+            return 0
+        cached_length = past_key_values.get_seq_length()
+        # At least one token has to be left for the model to process
+        limit = min(len(self.token_ids), cached_length, len(token_ids) - 1)
+        common = 0
+        while common < limit and self.token_ids[common] == token_ids[common]:
+            common += 1
+        if 0 < common < cached_length:
+            try:
+                # A negative length removes that many tokens from the end
+                past_key_values.crop(common - cached_length)
+            except (RuntimeError, ValueError) as e:
+                logger.debug(f"Prefix cache not cropped: {e}")
+                return 0
+        return common
+
+    def store(self, token_ids, past_key_values):
+        if not hasattr(past_key_values, "crop"):
+            warn_not_croppable(past_key_values)
+            self.clear()
+            return
+        self.token_ids = token_ids
+        self.past_key_values = past_key_values
+
+    def clear(self):
+        self.token_ids = []
+        self.past_key_values = None
+
+
+_warned_lock = threading.Lock()
+_warned_types = set()
+
+
+def warn_not_croppable(past_key_values):
+    name = type(past_key_values).__name__
+    with _warned_lock:
+        if name in _warned_types:
+            return
+        _warned_types.add(name)
+    logger.warning(
+        f"{name} cannot be cropped, so the prefix cache is never reused with this model"
+    )
+
+
+class PrefixReuseStats:
+    """
+    Running totals of prompt tokens looked up in prefix caches and of those
+    served from a cache instead of being prefilled.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+        self.lock = threading.Lock()
+
+    def record(self, prompt_tokens, reused_tokens):
+        with self.lock:
+            self.lookups += 1
+            self.hits += 1 if reused_tokens else 0
+            self.prompt_tokens += prompt_tokens
+            self.reused_tokens += reused_tokens
+
+    def stats(self):
+        with self.lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "prompt_tokens": self.prompt_tokens,
+                "reused_tokens": self.reused_tokens,
+                "reuse_rate": self.reused_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+# The process-wide totals, exported as gauges by the inference server
+reuse_stats = PrefixReuseStats()
@@ -0,0 +1,134 @@
+# scripts/prefork.py
+
+# Description: Pre-fork worker mode for CPU nodes. The parent loads the model
+# once and forks the workers, which share the weights copy-on-write and
+# accept connections from the same listening socket. Each worker is pinned
+# to its own slice of cores and sizes its torch thread pool to match.
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a crashed worker is replaced, so a worker failing on start
+# does not spin
+RESPAWN_DELAY = 1.0
+
+
+def core_slices(cores, workers):
+    """
+    Split cores into contiguous slices, one per worker.
+
+    Args:
+    - cores (list): The usable core ids.
+    - workers (int): Number of workers.
+
+    Returns:
+    - list: One list of core ids per worker. Slice sizes differ by at most one.
+    """
+    if not 0 < workers <= len(cores):
+        raise ValueError(f"Cannot split {len(cores)} cores between {workers} workers")
+    size, extra = divmod(len(cores), workers)
+    slices = []
+    start = 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        slices.append(list(cores[start:end]))
+        start = end
+    return slices
+
+
+def pin_worker(cores):
+    """
+    Restrict the calling process to the given cores and size torch's
+    intra-op thread pool to match.
+    """
+    import torch
+
+    os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+
+def bind_socket(socket_path):
+    """
+    Create the listening Unix socket the workers share.
+
+    Args:
+    - socket_path (str): Path to bind the socket to.
+
+    Returns:
+    - socket.socket: The listening socket.
+    """
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.listen(128)
+    return sock
+
+
+def run_workers(workers, serve):
+    """
+    Fork the workers and replace any that exit until the parent is stopped.
+    Must be called before any thread is started, since only the calling
+    thread survives a fork.
+
+    Args:
+    - workers (int): Number of workers.
+    - serve (callable): Run in each worker with its index; returns when the
+      worker is stopped.
+    """
+    slices = core_slices(sorted(os.sched_getaffinity(0)), workers)
+    # Objects allocated so far, the model included, are never collected, so
+    # the collector does not write to the pages the workers share
+    gc.freeze()
+    children = {}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                pin_worker(slices[index])
+                logger.info(f"Worker {index} serving on cores {slices[index]}")
+                serve(index)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 0
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+            finally:
+                # Never fall back into the parent's code
+                os._exit(code)
+        children[pid] = index
+
+    try:
+        for index in range(workers):
+            spawn(index)
+        while True:
+            pid, status = os.wait()
+            index = children.pop(pid, None)
+            if index is None:
+                continue
+            logger.warning(
+                f"Worker {index} exited with status {os.waitstatus_to_exitcode(status)}, restarting"
+            )
+            time.sleep(RESPAWN_DELAY)
+            spawn(index)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Workers save their queued memory turns before they exit
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
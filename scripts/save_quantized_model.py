@@ -4,28 +4,29 @@ import os
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
 from tqdm import tqdm
+from cpu_int8 import CPU_INT8_DIR, quantize, save_cpu_int8
 import subprocess
 
-import argparse
-
 # Define constants
 MODEL_ID = "google/Gemma-2-2b-it"  # The model you are using
 MODEL_SAVE_DIR = "/home/ncacord/qRaphael/models/qRaphael-2b-it"
 
-# Argument parser setup
-parser = argparse.ArgumentParser(description="Load and run a quantized model with logging.")
-parser.add_argument("--cache_dir", type=str, default="./cache", help="The directory for caching.")
-args = parser.parse_args()
-
-CACHE_DIR = args.cache_dir
-
 # Argument parser setup
 parser = argparse.ArgumentParser(
     description="Load and run a quantized model with logging."
 )
+parser.add_argument("--cache_dir", type=str, default="./cache", help="The directory for caching.")
 parser.add_argument("--log_dir", type=str, default="/home/ncacord/qRaphael/logs", help="The directory to save the logs.")
+parser.add_argument("--trace", action="store_true", help="Enable trace-level logging.")
+parser.add_argument(
+    "--mode",
+    choices=["nf4", "cpu-int8"],
+    default="nf4",
+    help="nf4: bitsandbytes 4-bit for GPUs. cpu-int8: PyTorch dynamic int8 for CPU nodes.",
+)
 args = parser.parse_args()
 
+CACHE_DIR = args.cache_dir
 LOG_DIR = args.log_dir
 
 # Ensure directories exist
@@ -42,13 +43,6 @@ STANDARD_LOG_PATH = os.path.join(LOG_DIR, "standard/model_init_logs.log")
 os.makedirs(os.path.dirname(STANDARD_LOG_PATH), exist_ok=True)
 
 
-# Argument parser setup
-parser = argparse.ArgumentParser(
-    description="Load and run a quantized model with logging."
-)
-parser.add_argument("--trace", action="store_true", help="Enable trace-level logging.")
-args = parser.parse_args()
-
 # Logging configuration
 log_level = logging.DEBUG if args.trace else logging.INFO
 log_file = TRACE_LOG_PATH if args.trace else STANDARD_LOG_PATH
@@ -89,6 +83,51 @@ def load_and_quantize_model(model_id, quantization_config):
     return tokenizer, model
 
 
+def load_and_quantize_model_cpu(model_id):
+    """
+    Load the model in full precision on the CPU and quantize its Linear
+    layers to int8 with PyTorch dynamic quantization. Weights are stored as
+    int8 and activations are quantized on the fly, so no GPU is needed.
+
+    Args:
+    - model_id (str): The model identifier.
+
+    Returns:
+    - tokenizer: The tokenizer associated with the model.
+    - model: The quantized model.
+    """
+    logger.info("Loading tokenizer...")
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    logger.info("Loading model for CPU quantization...")
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id,
+        torch_dtype=torch.float32,
+        cache_dir=CACHE_DIR,
+        low_cpu_mem_usage=True,
+    )
+    model.eval()
+
+    logger.info("Quantizing Linear layers to int8...")
+    return tokenizer, quantize(model)
+
+
+def save_cpu_quantized_model(model, tokenizer, save_directory):
+    """
+    Save a dynamically quantized model where model_loader picks it up on
+    nodes without CUDA when "cpu_int8" is set in text_gen_config.json.
+
+    Args:
+    - model: The quantized model.
+    - tokenizer: The tokenizer to save.
+    - save_directory (str): The directory to save the model and tokenizer.
+    """
+    logger.info("Saving CPU quantized model and tokenizer...")
+    save_cpu_int8(model, save_directory)
+    tokenizer.save_pretrained(save_directory)
+    logger.info(f"CPU quantized model saved to {os.path.join(save_directory, CPU_INT8_DIR)}")
+
+
 def save_model_and_tokenizer(model, tokenizer, save_directory):
     """
     Save the model and tokenizer to the specified directory.
@@ -120,6 +159,16 @@ def main():
     """
     Main function to load, quantize, and save the model, and log telemetry.
     """
+    if args.mode == "cpu-int8":
+        with tqdm(total=100, desc="Loading and quantizing model for CPU") as pbar:
+            tokenizer, model = load_and_quantize_model_cpu(MODEL_ID)
+            pbar.update(50)
+
+            save_cpu_quantized_model(model, tokenizer, MODEL_SAVE_DIR)
+            pbar.update(50)
+        logger.info("Script completed successfully.")
+        return
+
     quantization_config = BitsAndBytesConfig(
         load_in_4bit=True,
         bnb_4bit_use_double_quant=True,
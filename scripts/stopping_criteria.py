@@ -0,0 +1,65 @@
+# scripts/stopping_criteria.py
+
+# Description: Stopping criteria that end generation at a sentence boundary
+# or at a configured stop string, instead of generating up to the length
+# limit and throwing the tail away afterwards.
+
+import torch
+from transformers import StoppingCriteria
+from generation import END_PUNCTUATION
+
+# How many of the latest tokens are decoded to look for a sentence end or a
+# stop string
+TAIL_TOKENS = 16
+
+
+class SentenceStopping(StoppingCriteria):
+    """
+    Stop a row once it has generated at least its target number of new
+    tokens and its text ends a sentence, or as soon as it produces one of its
+    stop strings. Every row of a batch has its own target and stop strings.
+
+    Args:
+    - tokenizer: The loaded tokenizer.
+    - prompt_length (int): Length of the (padded) prompts in tokens.
+    - targets (list): New tokens per row after which the next sentence end
+      stops generation, or None to only stop at the length limit.
+    - stop_strings (list): Strings per row that stop generation immediately.
+    """
+
+    def __init__(self, tokenizer, prompt_length, targets, stop_strings):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.targets = targets
+        self.stop_strings = stop_strings
+
+    @classmethod
+    def from_configs(cls, tokenizer, prompt_length, configs):
+        """
+        Build the criteria from each row's generation parameters
+        ("target_new_tokens" and "stop_strings").
+
+        Returns:
+        - SentenceStopping: The criteria, or None when no row uses them.
+        """
+        targets = [config.get("target_new_tokens") for config in configs]
+        stop_strings = [tuple(config.get("stop_strings", ())) for config in configs]
+        if all(target is None for target in targets) and not any(stop_strings):
+            return None
+        return cls(tokenizer, prompt_length, targets, stop_strings)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        generated = input_ids.shape[1] - self.prompt_length
+        start = max(self.prompt_length, input_ids.shape[1] - TAIL_TOKENS)
+        done = []
+        for row, target, stops in zip(input_ids, self.targets, self.stop_strings):
+            tail = self.tokenizer.decode(row[start:], skip_special_tokens=True)
+            done.append(
+                any(stop in tail for stop in stops)
+                or (
+                    target is not None
+                    and generated >= target
+                    and tail.rstrip().endswith(END_PUNCTUATION)
+                )
+            )
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
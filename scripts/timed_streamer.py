@@ -0,0 +1,44 @@
+# scripts/timed_streamer.py
+
+# Description: Text streamer that records how long turning generated tokens
+# back into text takes.
+
+import time
+from transformers import TextIteratorStreamer
+from logic.metrics import metrics
+
+
+class TimedTextStreamer(TextIteratorStreamer):
+    """
+    TextIteratorStreamer that adds up the time spent decoding tokens and
+    records it as the "detokenize" stage once generation ends. It also counts
+    the generation steps after the prompt and the tokens they produced, which
+    differ with assisted decoding, and when the first of them arrived:
+    the text itself is held back until a word is complete.
+    """
+
+    def __init__(self, tokenizer, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.decode_seconds = 0.0
+        self.prompt_seen = False
+        self.steps = 0
+        self.tokens = 0
+        self.first_token_time = None
+
+    def put(self, value):
+        # The first call carries the prompt
+        if self.prompt_seen:
+            if self.first_token_time is None:
+                self.first_token_time = time.perf_counter()
+            self.steps += 1
+            self.tokens += value.numel()
+        self.prompt_seen = True
+        start = time.perf_counter()
+        super().put(value)
+        self.decode_seconds += time.perf_counter() - start
+
+    def end(self):
+        start = time.perf_counter()
+        super().end()
+        self.decode_seconds += time.perf_counter() - start
+        metrics.observe("detokenize", self.decode_seconds)
@@ -0,0 +1,96 @@
+# scripts/token_buffer.py
+
+# Description: Per-session cache of the token ids of prompt lines. From one
+# turn to the next the prompt repeats the history and profile lines, so only
+# the lines that are new get tokenized and the ids are joined directly.
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Lines are split after a run of newlines, so "\n\n" stays one piece
+LINE_PATTERN = re.compile(r"(?<=\n)(?!\n)")
+
+# Line starts that tokenizers commonly treat differently when a line is
+# tokenized on its own: words, indentation, tabs and blank lines
+PROBE_TEXT = "User: hello there\nReply: fine.\n  indented line\n\n\tTabbed\n x\nend"
+
+
+class TokenBuffer:
+    """
+    Token ids of the lines of the session's last prompt. encode() reuses them
+    for lines that appear again and tokenizes only the rest, so tokenizing a
+    turn costs in proportion to the new text rather than to the history.
+    Each line is tokenized with its trailing newline, and only the lines of
+    the last prompt are kept.
+
+    Joining the ids of separately tokenized lines only gives the ids of the
+    whole prompt when the tokenizer never merges across a line start and
+    adds nothing to the start of each call. The first encode() checks this
+    on a probe text and on the prompt itself; when the ids differ the buffer
+    tokenizes whole prompts from then on.
+    """
+
+    def __init__(self):
+        self.pieces = {}
+        self.special_ids = None
+        # None until checked against the tokenizer
+        self.line_safe = None
+        # Characters tokenized by the last encode(), for logging
+        self.tokenized_chars = 0
+
+    def encode(self, tokenizer, text):
+        """
+        Token ids of a prompt, as tokenizer(text).input_ids would return them.
+
+        Args:
+        - tokenizer: The loaded tokenizer.
+        - text (str): The prompt.
+
+        Returns:
+        - list: The token ids.
+        """
+        if self.line_safe is None:
+            ids = tokenizer(text).input_ids
+            self.line_safe = (
+                self.encode_lines(tokenizer, PROBE_TEXT) == tokenizer(PROBE_TEXT).input_ids
+                and self.encode_lines(tokenizer, text) == ids
+            )
+            if not self.line_safe:
+                logger.warning(
+                    "Tokenizing line by line changes the token ids with this "
+                    "tokenizer; tokenizing whole prompts instead"
+                )
+                self.pieces = {}
+            self.tokenized_chars = len(text)
+            return ids
+        if not self.line_safe:
+            self.tokenized_chars = len(text)
+            return tokenizer(text).input_ids
+        return self.encode_lines(tokenizer, text)
+
+    def encode_lines(self, tokenizer, text):
+        if self.special_ids is None:
+            # The tokens the tokenizer adds around any text, e.g. BOS
+            self.special_ids = tokenizer("").input_ids
+        pieces = {}
+        ids = list(self.special_ids)
+        tokenized_chars = 0
+        for piece in LINE_PATTERN.split(text):
+            if not piece:
+                continue
+            piece_ids = pieces.get(piece)
+            if piece_ids is None:
+                piece_ids = self.pieces.get(piece)
+            if piece_ids is None:
+                piece_ids = tokenizer(piece, add_special_tokens=False).input_ids
+                tokenized_chars += len(piece)
+            pieces[piece] = piece_ids
+            ids.extend(piece_ids)
+        self.pieces = pieces
+        self.tokenized_chars = tokenized_chars
+        return ids
+
+    def clear(self):
+        self.pieces = {}
@@ -0,0 +1,9 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The scripts import their sibling modules directly, as they do when they are
+# run from the scripts directory
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,23 @@
+# tests/test_assisted_decoding.py
+
+from assisted_decoding import AcceptanceStats
+
+
+def test_acceptance_rate_from_steps_and_tokens():
+    stats = AcceptanceStats()
+    # 4 steps of 5 proposals yielding 12 tokens: 8 drafts accepted plus one
+    # token of the model's own per step
+    assert stats.record(steps=4, tokens=12, num_assistant_tokens=5) == 0.4
+    # Every draft rejected
+    assert stats.record(steps=10, tokens=10, num_assistant_tokens=5) == 0.0
+    assert stats.stats() == {
+        "proposed_tokens": 70,
+        "accepted_tokens": 8,
+        "acceptance_rate": 8 / 70,
+    }
+
+
+def test_nothing_generated_reports_zero():
+    stats = AcceptanceStats()
+    assert stats.record(steps=0, tokens=0, num_assistant_tokens=5) == 0.0
+    assert stats.stats()["acceptance_rate"] == 0.0
@@ -0,0 +1,92 @@
+# tests/test_batching.py
+
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from batching import BatchStreamer, GenerationRequest, RowEnds, RowLimits
+
+PAD = 0
+
+
+class CharTokenizer:
+    # One token per character; token 0 is padding
+    pad_token_id = PAD
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(token) for token in ids if token != PAD)
+
+
+def tokens(text):
+    return [ord(char) for char in text]
+
+
+def drain(request):
+    request.finish()
+    return list(request.stream())
+
+
+def test_each_row_stops_at_its_own_limits():
+    now = time.monotonic()
+    limits = RowLimits(
+        prompt_length=4, max_new_tokens=[2, 5, 5], deadlines=[now + 60, now + 60, now - 1]
+    )
+    input_ids = torch.zeros((3, 6), dtype=torch.long)
+    # Two new tokens: the first row is at its limit, the third past its deadline
+    assert limits(input_ids, None).tolist() == [True, False, True]
+    assert limits(torch.zeros((3, 9), dtype=torch.long), None).tolist() == [True, True, True]
+
+
+def test_each_row_records_when_it_was_ended():
+    now = time.monotonic()
+    limits = RowLimits(prompt_length=2, max_new_tokens=[1, 3], deadlines=[now + 60, now + 60])
+    ends = RowEnds([limits], 2)
+    assert ends(torch.zeros((2, 3), dtype=torch.long), None).tolist() == [True, False]
+    first_end = ends.end_times[0]
+    assert first_end is not None and ends.end_times[1] is None
+
+    assert ends(torch.zeros((2, 5), dtype=torch.long), None).tolist() == [True, True]
+    # A row keeps the time it was first ended at
+    assert ends.end_times[0] == first_end
+    assert ends.end_times[1] >= first_end
+
+
+def test_batch_streamer_splits_sentences_per_row():
+    requests = [
+        GenerationRequest("a", {}),
+        GenerationRequest("b", {"stop_strings": ["User:"]}),
+    ]
+    streamer = BatchStreamer(CharTokenizer(), requests)
+    # The prompts come first and are not part of the replies
+    streamer.put(torch.tensor([[1, 2], [3, 4]]))
+    first = "Hi. How are you"
+    second = "Fine! User: more"
+    for step in range(len(second)):
+        streamer.put(
+            torch.tensor(
+                [
+                    # The first row is done and padded after its last token
+                    tokens(first[step]) if step < len(first) else [PAD],
+                    tokens(second[step]),
+                ]
+            )
+        )
+    streamer.end()
+
+    assert drain(requests[0]) == ["Hi."]
+    assert drain(requests[1]) == ["Fine!"]
+    assert len(streamer.tokens[0]) == len(first)
+    assert streamer.first_token_times[0] is not None
+
+
+def test_reply_without_sentence_end_is_passed_on_whole():
+    request = GenerationRequest("a", {})
+    streamer = BatchStreamer(CharTokenizer(), [request])
+    streamer.put(torch.tensor([[1]]))
+    for char in "no end":
+        streamer.put(torch.tensor([tokens(char)]))
+    streamer.end()
+    assert drain(request) == ["no end"]
@@ -0,0 +1,19 @@
+# tests/test_benchmark.py
+
+from benchmark import find_regressions, percentile, summarize_timings
+
+
+def test_percentiles_per_stage():
+    timings = {"tokenize": [i / 1000 for i in range(1, 101)], "generate": []}
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert summarize_timings(timings) == {"tokenize": {"p50": 50.0, "p95": 95.0}}
+
+
+def test_regressions_beyond_threshold_are_reported():
+    baseline = {"tokenize": {"p50": 10.0, "p95": 20.0}}
+    assert find_regressions({"tokenize": {"p50": 11.0, "p95": 23.0}}, baseline, 0.2) == []
+    assert find_regressions({"tokenize": {"p50": 13.0, "p95": 23.0}}, baseline, 0.2) == [
+        "tokenize p50 13.0ms, baseline 10.0ms"
+    ]
+    # Stages missing from the baseline are not compared
+    assert find_regressions({"generate": {"p50": 1.0, "p95": 2.0}}, baseline, 0.2) == []
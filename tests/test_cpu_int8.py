@@ -0,0 +1,52 @@
+# tests/test_cpu_int8.py
+
+import os
+
+import pytest
+
+from cpu_int8 import CPU_INT8_DIR, STATE_DICT_FILE, use_cpu_int8
+
+
+def write_artifact(model_dir):
+    os.makedirs(model_dir / CPU_INT8_DIR)
+    (model_dir / CPU_INT8_DIR / STATE_DICT_FILE).write_bytes(b"")
+
+
+def test_checkpoint_is_loaded_unless_cpu_int8_is_set(tmp_path):
+    write_artifact(tmp_path)
+    # An artifact on disk is not enough
+    assert not use_cpu_int8(str(tmp_path), False, cuda_available=False)
+    assert use_cpu_int8(str(tmp_path), True, cuda_available=False)
+
+
+def test_gpus_load_the_checkpoint(tmp_path):
+    write_artifact(tmp_path)
+    assert not use_cpu_int8(str(tmp_path), True, cuda_available=True)
+
+
+def test_missing_artifact_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError, match="save_quantized_model.py"):
+        use_cpu_int8(str(tmp_path), True, cuda_available=False)
+
+
+def test_saved_model_is_rebuilt_from_its_state_dict(tmp_path):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from cpu_int8 import load_cpu_int8, quantize, save_cpu_int8
+
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        num_key_value_heads=2,
+        vocab_size=100,
+    )
+    model = quantize(transformers.LlamaForCausalLM(config).eval())
+    save_cpu_int8(model, str(tmp_path))
+
+    loaded = load_cpu_int8(str(tmp_path))
+    input_ids = torch.tensor([[1, 2, 3, 4]])
+    with torch.no_grad():
+        assert torch.equal(model(input_ids).logits, loaded(input_ids).logits)
@@ -0,0 +1,154 @@
+# tests/test_db_pool.py
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from psycopg2 import extensions, pool
+
+from logic import db_pool
+from logic.db_pool import ConnectionPool, uses_connection
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.conn.pings += 1
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.pings = 0
+        self.rollbacks = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool.time, "monotonic", clock)
+    return clock
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_idle_connections_are_pinged_before_reuse(clock):
+    connections, opened = make_pool(min_size=1, check_interval=30)
+    conn = connections.getconn()
+    connections.putconn(conn)
+    # Recently used connections are handed out without a ping
+    assert connections.getconn() is conn and conn.pings == 0
+    connections.putconn(conn)
+
+    clock.now += 31
+    assert connections.getconn() is conn and conn.pings == 1
+    connections.putconn(conn)
+
+    # A connection failing the ping is replaced
+    clock.now += 31
+    conn.broken = True
+    replacement = connections.getconn()
+    assert replacement is not conn and conn.closed
+    assert len(opened) == 2
+
+
+def test_connections_are_recycled_after_max_age(clock):
+    connections, opened = make_pool(min_size=1, max_age=60)
+    conn = connections.getconn()
+    connections.putconn(conn)
+    clock.now += 61
+    assert connections.getconn() is not conn
+    assert conn.closed and len(opened) == 2
+
+
+def test_exhausted_pool_times_out(clock):
+    connections, _ = make_pool(min_size=0, max_size=2, timeout=0.05)
+    first, second = connections.getconn(), connections.getconn()
+    with pytest.raises(pool.PoolError):
+        connections.getconn()
+    # A returned connection frees its slot
+    connections.putconn(first)
+    assert connections.getconn() is first
+    connections.putconn(second)
+
+
+def test_connections_are_returned_after_exceptions(clock):
+    connections, opened = make_pool(min_size=0, max_size=1, timeout=0.05)
+    with pytest.raises(ValueError):
+        with connections.connection() as conn:
+            conn.status = extensions.TRANSACTION_STATUS_INERROR
+            raise ValueError("bad row")
+    # The failed transaction is rolled back and the connection reused
+    assert conn.rollbacks == 1
+    with connections.connection() as again:
+        assert again is conn
+
+    with pytest.raises(psycopg2.OperationalError):
+        with connections.connection() as conn:
+            raise psycopg2.OperationalError("connection lost")
+    # A connection failing with an operational error is not reused, but its
+    # slot is freed
+    assert conn.closed
+    with connections.connection() as fresh:
+        assert fresh is not conn
+    assert len(opened) == 2
+
+
+def test_uses_connection_keeps_arguments_after_conn(clock):
+    connections, _ = make_pool(min_size=1)
+    pooled = uses_connection(lambda: connections)
+
+    @pooled
+    def fetch(user_id, conn=None, limit=None):
+        return user_id, conn, limit
+
+    conn = FakeConnection()
+    assert fetch("alice", conn, 5) == ("alice", conn, 5)
+    user_id, borrowed, limit = fetch("alice", None, 5)
+    assert (user_id, limit) == ("alice", 5) and isinstance(borrowed, FakeConnection)
+    assert fetch("alice", limit=3)[2] == 3
+    assert fetch("alice", conn=conn)[1] is conn
+    # Borrowed connections go back to the pool
+    assert connections.idle == [borrowed]
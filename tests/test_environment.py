@@ -3,7 +3,7 @@
 import sys
 import os
 import logging
-from scripts.utils import setup_logging
+from utils import setup_logging
 
 
 def test_python_version():
@@ -0,0 +1,37 @@
+# tests/test_generation.py
+
+from generation import SentenceBuffer
+
+
+def feed_all(buffer, chunks):
+    return [buffer.feed(chunk) for chunk in chunks] + [buffer.flush()]
+
+
+def test_text_is_passed_on_one_sentence_at_a_time():
+    buffer = SentenceBuffer()
+    assert feed_all(buffer, ["Hello", " there. How", " are you? I", " am"]) == [
+        "",
+        "Hello there.",
+        " How are you?",
+        "",
+        # The unfinished sentence at the end is dropped
+        "",
+    ]
+
+
+def test_reply_without_sentence_end_is_passed_on_whole():
+    buffer = SentenceBuffer()
+    assert feed_all(buffer, ["no", " end"]) == ["", "", "no end"]
+
+
+def test_stop_string_split_across_chunks_is_trimmed():
+    buffer = SentenceBuffer(["User:"])
+    assert feed_all(buffer, ["Fine. Us", "er: and then. More."]) == ["Fine.", "", ""]
+    assert buffer.stopped
+    # Nothing after the stop string is passed on
+    assert buffer.feed("Later.") == ""
+
+
+def test_text_before_a_stop_string_without_sentence_end_is_kept():
+    buffer = SentenceBuffer(["\nUser"])
+    assert feed_all(buffer, ["Sure thing\nUs", "er: what"]) == ["", "", "Sure thing"]
@@ -0,0 +1,49 @@
+# tests/test_inference_client.py
+
+import json
+import socket
+import subprocess
+import sys
+import threading
+
+from inference_client import InferenceClient
+
+
+def serve_pings(sock):
+    conn, _ = sock.accept()
+    with conn, conn.makefile("rwb") as stream:
+        for line in stream:
+            assert json.loads(line) == {"action": "ping"}
+            stream.write(b'{"status": "ok"}\n')
+            stream.flush()
+
+
+def test_wait_until_ready_once_the_socket_answers(tmp_path):
+    path = str(tmp_path / "inference.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen()
+    threading.Thread(target=serve_pings, args=(sock,), daemon=True).start()
+    client = InferenceClient(path, timeout=5)
+    try:
+        assert client.wait_until_ready(5)
+    finally:
+        client.close()
+        sock.close()
+
+
+def test_wait_until_ready_ignores_stale_socket_files(tmp_path):
+    path = str(tmp_path / "inference.sock")
+    # Bound but never listening, like the leftover of a crashed server
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+    assert not InferenceClient(path, timeout=1).wait_until_ready(0.3, interval=0.05)
+
+
+def test_wait_until_ready_stops_when_the_server_exits(tmp_path):
+    server = subprocess.Popen([sys.executable, "-c", "pass"])
+    server.wait()
+    client = InferenceClient(str(tmp_path / "missing.sock"))
+    # Returns at once instead of waiting out the timeout
+    assert not client.wait_until_ready(60, pid=server.pid)
@@ -0,0 +1,113 @@
+# tests/test_inference_server.py
+
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from logic.utils import load_config
+import inference_server
+from inference_client import InferenceClient, InferenceServerError
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+
+
+class FakeTokenizer:
+    pad_token = "<pad>"
+    eos_token = "<eos>"
+
+
+class FakeSession:
+    # Stands in for ChatSession, which needs the database and the model
+    def __init__(self, user_id, *args):
+        self.user_id = user_id
+        self.prompts = []
+
+    def respond(self, prompt):
+        for message in self.respond_stream(prompt):
+            pass
+        return message
+
+    def respond_stream(self, prompt):
+        self.prompts.append(prompt)
+        yield {"chunk": "Hello."}
+        yield {"chunk": " Bye."}
+        yield {"response": f"Hello {self.user_id}, turn {len(self.prompts)}.", "followup": None}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference_server, "ChatSession", FakeSession)
+    monkeypatch.setattr(
+        inference_server, "SECTION_CONFIG_FILE", os.path.join(CONFIG_DIR, "section_keywords.json")
+    )
+    monkeypatch.setattr(
+        inference_server, "INTENT_CONFIG_FILE", os.path.join(CONFIG_DIR, "intents.json")
+    )
+    config = dict(
+        load_config(os.path.join(CONFIG_DIR, "text_gen_config.json")),
+        memory_retrieval_k=0,
+        response_cache_intents=[],
+    )
+    server = inference_server.InferenceServer(
+        str(tmp_path / "inference.sock"), FakeTokenizer(), None, config
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_requests_are_answered_line_by_line(server):
+    client = InferenceClient(server.socket_path, timeout=5)
+    try:
+        assert client.ping() == {"status": "ok"}
+        assert client.chat("s1", "alice", "hi")["response"] == "Hello alice, turn 1."
+        messages = list(client.chat_stream("s1", "alice", "again"))
+        assert [message.get("chunk") for message in messages[:-1]] == ["Hello.", " Bye."]
+        assert messages[-1]["response"] == "Hello alice, turn 2."
+        # A failed request is answered with an error and the connection stays usable
+        with pytest.raises(InferenceServerError, match="Unknown action"):
+            client.request({"action": "reboot"})
+        assert client.metrics()["gauges"]["server_sessions"] == 1
+    finally:
+        client.close()
+
+
+def test_sessions_are_closed_with_their_connection(server):
+    first = InferenceClient(server.socket_path, timeout=5)
+    second = InferenceClient(server.socket_path, timeout=5)
+    try:
+        first.chat("s1", "alice", "hi")
+        first.chat("s2", "alice", "hi")
+        second.chat("s3", "bob", "hi")
+        assert set(server.sessions) == {"s1", "s2", "s3"}
+
+        first.close_session("s1")
+        assert set(server.sessions) == {"s2", "s3"}
+
+        # A client that goes away without closing its sessions
+        first.close()
+        assert wait_for(lambda: set(server.sessions) == {"s3"})
+        assert second.chat("s3", "bob", "hi")["response"] == "Hello bob, turn 2."
+    finally:
+        first.close()
+        second.close()
+    assert wait_for(lambda: not server.sessions)
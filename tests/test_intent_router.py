@@ -0,0 +1,25 @@
+# tests/test_intent_router.py
+
+import os
+
+from logic.intent_router import load_intent_router
+
+INTENT_CONFIG_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "intents.json"
+)
+
+
+def test_simple_requests_are_recognized():
+    router = load_intent_router(INTENT_CONFIG_FILE)
+    assert router.match("What is your name?") == ("identity", {})
+    assert router.match("help") == ("identity", {})
+    assert router.match("What should I do today?") == ("suggestions", {})
+    assert router.match("Hi, my name is Ada Lovelace.") == ("set_name", {"name": "Ada Lovelace"})
+
+
+def test_model_prompts_are_not_stolen():
+    router = load_intent_router(INTENT_CONFIG_FILE)
+    assert router.match("Can you help me plan a trip to Rome?") is None
+    assert router.match("This is a helpful suggestion box") is None
+    assert router.match("Suggest a name for my dog") is None
+    assert router.match("my name is Ada and I like chess") is None
@@ -0,0 +1,59 @@
+# tests/test_keyword_matcher.py
+
+import random
+import string
+import time
+
+from logic.keyword_matcher import KeywordMatcher
+
+
+def first_keyword(keywords, text):
+    for index, keyword in enumerate(keywords):
+        if keyword in text:
+            return index
+    return None
+
+
+def test_priority_follows_keyword_order():
+    matcher = KeywordMatcher(["moon", "art", "start", "he"])
+    assert matcher.first("the start of the moon landing") == 0
+    assert matcher.first("a fresh start") == 1
+    assert matcher.first("she said") == 3
+    assert matcher.first("nothing to see") is None
+
+
+def test_matches_naive_scan_on_random_keywords():
+    rng = random.Random(0)
+    for _ in range(500):
+        keywords = [
+            "".join(rng.choice("abc ") for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 10))
+        ]
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+        assert KeywordMatcher(keywords).first(text) == first_keyword(keywords, text)
+
+
+def test_benchmark_thousands_of_keywords():
+    rng = random.Random(1)
+    keywords = [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+        for _ in range(5000)
+    ]
+    text = " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+        for _ in range(300)
+    )
+    matcher = KeywordMatcher(keywords)
+
+    start = time.perf_counter()
+    for _ in range(20):
+        expected = first_keyword(keywords, text)
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(20):
+        found = matcher.first(text)
+    matcher_time = time.perf_counter() - start
+
+    assert found == expected
+    assert matcher_time < naive_time
@@ -0,0 +1,25 @@
+# tests/test_memory_compaction.py
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from logic import memory_compaction
+from logic.memory_compaction import compact_user_memory
+
+
+def test_watermark_is_the_last_memory_id(monkeypatch):
+    saved = []
+    # Rows saved in one batch share a timestamp, so only ids order them
+    rows = [("turn 7", 7), ("turn 8", 8), ("turn 9", 9)]
+    monkeypatch.setattr(memory_compaction, "fetch_turns_to_compact", lambda *args: rows)
+    monkeypatch.setattr(memory_compaction, "fetch_memory_summary", lambda user_id: "")
+    monkeypatch.setattr(
+        memory_compaction,
+        "save_memory_summary",
+        lambda user_id, summary, until: saved.append((user_id, summary, until)),
+    )
+
+    assert compact_user_memory("alice", lambda prompt: " summary ", 20, 3) == 3
+    assert saved == [("alice", "summary", 9)]
@@ -0,0 +1,51 @@
+# tests/test_memory_index.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from logic.memory_index import MemoryIndex
+
+
+def test_search_ranks_relevant_turns_first(tmp_path):
+    index = MemoryIndex(str(tmp_path), dim=256)
+    index.add_many(
+        "alice",
+        [
+            (1, "I adopted a dog named Rex"),
+            (2, "My favourite food is ramen"),
+            (3, "Rex the dog needs a vet appointment"),
+        ],
+    )
+    assert index.search("alice", "dog Rex", 3) == [1, 3]
+    assert index.search("alice", "unrelated words here", 3) == []
+    assert index.search("bob", "dog", 3) == []
+
+
+def test_index_persists_and_skips_known_turns(tmp_path):
+    index = MemoryIndex(str(tmp_path), dim=64)
+    for memory_id in range(1, 40):
+        index.add("alice", memory_id, f"turn number {memory_id}")
+    index.add("alice", 5, "turn number 5")
+
+    reloaded = MemoryIndex(str(tmp_path), dim=64)
+    assert reloaded.last_id("alice") == 39
+    assert reloaded.load("alice").count == 39
+    assert reloaded.search("alice", "turn", 1)
+
+
+def test_processes_sharing_the_files_see_each_others_rows(tmp_path):
+    # Two pre-fork workers, each with its own in-memory copy of the index
+    first = MemoryIndex(str(tmp_path), dim=64)
+    second = MemoryIndex(str(tmp_path), dim=64)
+    first.add_many("alice", [(1, "walked the dog"), (2, "fed the dog")])
+    assert second.search("alice", "dog", 5) == first.search("alice", "dog", 5)
+
+    second.add_many("alice", [(2, "fed the dog"), (3, "the dog slept")])
+    first.add_many("alice", [(3, "the dog slept"), (3, "the dog slept")])
+    assert first.last_id("alice") == 3
+    assert sorted(first.search("alice", "dog", 5)) == [1, 2, 3]
+
+    # Each id is written to the files once
+    ids_path, _ = first.paths("alice")
+    assert sorted(np.fromfile(ids_path, dtype=np.int64)) == [1, 2, 3]
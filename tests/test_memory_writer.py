@@ -0,0 +1,59 @@
+# tests/test_memory_writer.py
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from logic import memory_writer
+from logic.memory_writer import MemoryWriter
+
+
+def test_batches_retries_and_flushes_on_stop(monkeypatch):
+    batches = []
+    failures = [1]
+
+    def save_user_memories(rows):
+        if failures[0]:
+            failures[0] -= 1
+            raise psycopg2.OperationalError("connection lost")
+        batches.append(rows)
+        return list(range(len(rows)))
+
+    monkeypatch.setattr(memory_writer, "save_user_memories", save_user_memories)
+    writer = MemoryWriter(max_queue=10, batch_size=2, retry_delay=0)
+    saved = []
+    for i in range(3):
+        writer.submit("alice", f"turn {i}", saved.append)
+    writer.start()
+    writer.stop()
+
+    assert batches == [
+        [("alice", "turn 0"), ("alice", "turn 1")],
+        [("alice", "turn 2")],
+    ]
+    assert saved == [0, 1, 0]
+    assert not writer.is_alive()
+
+
+def test_failing_batch_is_saved_row_by_row(monkeypatch):
+    saved_rows = []
+
+    def save_user_memories(rows):
+        if any(text == "bad" for _, text in rows):
+            raise psycopg2.DataError("invalid byte sequence")
+        saved_rows.extend(rows)
+        return [len(saved_rows) - len(rows) + i for i in range(len(rows))]
+
+    monkeypatch.setattr(memory_writer, "save_user_memories", save_user_memories)
+    writer = MemoryWriter(max_queue=10, batch_size=3, retry_delay=0)
+    saved = []
+    writer.submit("alice", "turn 0", saved.append)
+    writer.submit("bob", "bad", saved.append)
+    writer.submit("carol", "turn 1", saved.append)
+    writer.start()
+    writer.stop()
+
+    # Only the bad row is lost; the other users' rows are saved in order
+    assert saved_rows == [("alice", "turn 0"), ("carol", "turn 1")]
+    assert saved == [0, 1]
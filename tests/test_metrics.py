@@ -0,0 +1,36 @@
+# tests/test_metrics.py
+
+from logic.metrics import MetricsRegistry
+
+
+def test_histograms_and_gauges_export():
+    registry = MetricsRegistry()
+    registry.observe("tokenize", 0.002)
+    registry.observe("tokenize", 0.3)
+    with registry.span("db_fetch", query="profile"):
+        pass
+    registry.register_gauges("profile_cache", lambda: {"hits": 3})
+
+    snapshot = registry.snapshot()
+    tokenize = next(entry for entry in snapshot["stages"] if entry["stage"] == "tokenize")
+    assert tokenize["count"] == 2
+    assert dict((str(bound), count) for bound, count in tokenize["buckets"])["0.0025"] == 1
+    assert tokenize["buckets"][-1] == ["+Inf", 2]
+    assert snapshot["gauges"] == {"profile_cache_hits": 3}
+
+    text = registry.prometheus()
+    assert 'qraphael_stage_seconds_bucket{le="0.0025",stage="tokenize"} 1' in text
+    assert 'qraphael_stage_seconds_count{query="profile",stage="db_fetch"} 1' in text
+    assert "qraphael_profile_cache_hits 3" in text
+
+
+def test_process_labels_are_added_to_every_series():
+    registry = MetricsRegistry()
+    registry.set_labels(worker=1)
+    registry.observe("tokenize", 0.002)
+    registry.register_gauges("server", lambda: {"sessions": 2})
+
+    assert registry.snapshot()["stages"][0]["labels"] == {"worker": "1"}
+    text = registry.prometheus()
+    assert 'qraphael_stage_seconds_count{stage="tokenize",worker="1"} 1' in text
+    assert 'qraphael_server_sessions{worker="1"} 2' in text
@@ -0,0 +1,87 @@
+# tests/test_prefix_cache.py
+
+import pytest
+
+from prefix_cache import PrefixCache, PrefixReuseStats
+import prefix_cache as prefix_cache_module
+
+
+class FakeCache:
+    # Key/value cache holding one entry per token, cropped like DynamicCache
+    def __init__(self, length, window=None):
+        self.length = length
+        self.window = window
+
+    def get_seq_length(self):
+        return self.length
+
+    def crop(self, max_length):
+        if self.window is not None and self.length > self.window:
+            raise RuntimeError("sliding window reached")
+        self.length = max_length if max_length >= 0 else self.length + max_length
+
+
+class UncroppableCache:
+    def __init__(self, length):
+        self.length = length
+
+    def get_seq_length(self):
+        return self.length
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    stats = PrefixReuseStats()
+    monkeypatch.setattr(prefix_cache_module, "reuse_stats", stats)
+    return stats
+
+
+def test_cache_is_cropped_to_the_common_prefix(stats):
+    cache = PrefixCache()
+    cache.store([1, 2, 3, 4, 5, 6], FakeCache(6))
+    reused = cache.reuse([1, 2, 3, 9, 9])
+    assert reused.get_seq_length() == 3
+    assert cache.reused_tokens == 3
+    # The cache is handed over until the next store()
+    assert cache.reuse([1, 2, 3, 9, 9]) is None
+    assert stats.stats() == {
+        "lookups": 2,
+        "hits": 1,
+        "prompt_tokens": 10,
+        "reused_tokens": 3,
+        "reuse_rate": 0.3,
+    }
+
+
+def test_one_token_is_left_to_prefill():
+    cache = PrefixCache()
+    cache.store([1, 2, 3], FakeCache(3))
+    assert cache.reuse([1, 2, 3]).get_seq_length() == 2
+
+    cache.store([1, 2, 3], FakeCache(3))
+    assert cache.reuse([1, 2, 3, 4]).get_seq_length() == 3
+
+
+def test_nothing_is_reused_without_a_common_prefix():
+    cache = PrefixCache()
+    cache.store([1, 2, 3], FakeCache(3))
+    assert cache.reuse([7, 2, 3]) is None
+    assert cache.reused_tokens == 0
+
+
+def test_clear_invalidates_the_cache():
+    cache = PrefixCache()
+    cache.store([1, 2, 3], FakeCache(3))
+    cache.clear()
+    assert cache.reuse([1, 2, 3, 4]) is None
+
+
+def test_caches_that_cannot_be_cropped_are_not_reused():
+    cache = PrefixCache()
+    cache.store([1, 2, 3, 4], UncroppableCache(4))
+    assert cache.past_key_values is None
+    assert cache.reuse([1, 2, 3, 4, 5]) is None
+
+    # A sliding window layer past its window refuses to crop
+    cache.store([1, 2, 3, 4], FakeCache(4, window=2))
+    assert cache.reuse([1, 2, 9]) is None
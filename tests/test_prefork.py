@@ -0,0 +1,18 @@
+# tests/test_prefork.py
+
+import pytest
+
+from prefork import core_slices
+
+
+def test_cores_are_split_into_contiguous_slices():
+    assert core_slices(list(range(8)), 2) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert core_slices([0, 1, 2, 4, 5, 6, 7], 3) == [[0, 1, 2], [4, 5], [6, 7]]
+    assert core_slices([3], 1) == [[3]]
+
+
+def test_more_workers_than_cores_is_rejected():
+    with pytest.raises(ValueError):
+        core_slices([0, 1], 3)
+    with pytest.raises(ValueError):
+        core_slices([0, 1], 0)
@@ -0,0 +1,61 @@
+# tests/test_profile_cache.py
+
+import os
+
+from logic.profile_cache import MISSING, ProfileCache, cached_section
+
+
+def test_lru_eviction_and_counters():
+    cache = ProfileCache(max_entries=2, ttl=60)
+    cache.put("alice", "details", {"city": "Paris"})
+    cache.put("alice", "preferences", {})
+    assert cache.get("alice", "details") == {"city": "Paris"}
+    cache.put("bob", "details", {})
+
+    # "preferences" was the least recently used entry
+    assert cache.get("alice", "preferences") is MISSING
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+
+def test_expired_entries_are_misses():
+    cache = ProfileCache(ttl=-1)
+    cache.put("alice", "details", {})
+    assert cache.get("alice", "details") is MISSING
+
+
+def test_cached_section_and_invalidation():
+    cache = ProfileCache()
+    calls = []
+
+    @cached_section(cache, "name")
+    def fetch_user_name(user_id):
+        calls.append(user_id)
+        return None
+
+    assert fetch_user_name("alice") is None
+    assert fetch_user_name("alice") is None
+    assert calls == ["alice"]
+
+    cache.invalidate_user("alice")
+    fetch_user_name("alice")
+    assert calls == ["alice", "alice"]
+
+
+def test_invalidation_reaches_forked_processes():
+    cache = ProfileCache()
+    cache.put("alice", "name", "Alice")
+    pid = os.fork()
+    if pid == 0:
+        # A worker changing the user's name
+        cache.invalidate("alice", "name")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert cache.get("alice", "name") is MISSING
+
+
+def test_values_read_before_an_invalidation_are_not_cached_as_current():
+    cache = ProfileCache()
+    version = cache.version("alice")
+    cache.invalidate_user("alice")
+    cache.put("alice", "name", "old name", version)
+    assert cache.get("alice", "name") is MISSING
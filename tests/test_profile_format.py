@@ -0,0 +1,86 @@
+# tests/test_profile_format.py
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from logic.profile_format import ProfileFormatter, format_section, format_value
+
+LABELS = [
+    ("details", "User Details"),
+    ("medical", "User Medical"),
+    ("financial", "User Financial"),
+    ("interests", "User Interests"),
+]
+
+PROFILE = {
+    "details": {"name": "Alice", "city": None},
+    "medical": {
+        "medications": [
+            {
+                "medication_name": "Ibuprofen",
+                "dosage": "200mg",
+                "start_date": date(2024, 1, 2),
+                "end_date": None,
+                "prescribing_doctor": "Dr. Smith",
+            }
+        ],
+        "conditions": [],
+    },
+    "financial": {
+        "expense_tracking": [
+            {
+                "expense_category": "food",
+                "expense_amount": Decimal("12.50"),
+                "expense_date": datetime(2024, 3, 4),
+            }
+        ]
+    },
+    "interests": {"hobbies": ["chess", "hiking"], "food_preferences": None},
+}
+
+
+def test_values_are_rendered_compactly():
+    assert format_value(None) == ""
+    assert format_value(datetime(2024, 3, 4, 9, 30, 15)) == "2024-03-04 09:30"
+    assert format_value(datetime(2024, 3, 4)) == "2024-03-04"
+    assert format_value(Decimal("1000.00")) == "1000"
+    assert format_value(["a", None, "b"]) == "a; b"
+
+
+def test_profile_drops_nulls_and_shortens_keys():
+    lines = ProfileFormatter().format_profile(PROFILE, LABELS)
+    assert lines == [
+        "User Details: name=Alice",
+        "User Medical",
+        "medications: name=Ibuprofen, dosage=200mg, start_date=2024-01-02, prescribing_doctor=Dr. Smith",
+        "User Financial",
+        "expense_tracking: category=food, amount=12.5, date=2024-03-04",
+        "User Interests: hobbies=chess; hiking",
+    ]
+    compact = "\n".join(lines)
+    assert len(compact) < len(
+        "\n".join(f"{label}: {json.dumps(PROFILE[key], default=str)}" for key, label in LABELS)
+    )
+
+
+def test_empty_sections_are_left_out():
+    assert format_section("User Medical", {"conditions": [], "medications": []}) == []
+    assert format_section("User Details", {}) == []
+    assert format_section("User Security", {"passwords": None}) == []
+
+
+def test_sections_are_rendered_once_per_version():
+    formatter = ProfileFormatter()
+    rows = [{"expense_category": "food", "expense_amount": 5}]
+    first = formatter.format_profile({"financial": {"expense_tracking": rows}}, LABELS)
+    # Same cached list, new group dict: served from the formatter
+    again = formatter.format_profile({"financial": {"expense_tracking": rows}}, LABELS)
+    assert again == first
+    assert len(formatter.rendered) == 1
+    # A reloaded section is a new object and is rendered afresh
+    reloaded = [{"expense_category": "rent", "expense_amount": 900}]
+    assert formatter.format_profile({"financial": {"expense_tracking": reloaded}}, LABELS) == [
+        "User Financial",
+        "expense_tracking: category=rent, amount=900",
+    ]
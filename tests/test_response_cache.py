@@ -0,0 +1,35 @@
+# tests/test_response_cache.py
+
+from logic.response_cache import ResponseCache, response_key
+
+CONFIG = {"do_sample": True, "temperature": 0.6}
+
+
+def test_key_normalizes_prompt_and_tracks_profile_and_config():
+    profile = {"financial": {"expense_tracking": [{"amount": 12}]}}
+    key = response_key("Summarize my expenses!", profile, CONFIG)
+    assert key == response_key("  summarize MY expenses ", profile, CONFIG)
+    assert key != response_key("Summarize my expenses", {}, CONFIG)
+    assert key != response_key("Summarize my expenses", profile, dict(CONFIG, temperature=1.0))
+
+
+def test_entries_survive_reopening_and_are_evicted(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path, max_entries=2, ttl=60)
+    cache.put("a", "reply a")
+    cache.put("b", "reply b")
+    assert cache.get("a") == "reply a"
+    cache.put("c", "reply c")
+    cache.close()
+
+    cache = ResponseCache(path, max_entries=2, ttl=60)
+    # "b" was the least recently used entry
+    assert cache.get("b") is None
+    assert cache.get("a") == "reply a"
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 1}
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(":memory:", ttl=-1)
+    cache.put("a", "reply a")
+    assert cache.get("a") is None
@@ -0,0 +1,28 @@
+# tests/test_section_router.py
+
+from logic.section_router import SectionRouter
+
+SECTIONS = [
+    ("medical", "medications", "medications", ("medication_name", "dosage"), "many"),
+    ("medical", "doctor_visits", "doctor_visits", ("doctor_name", "visit_date"), "many"),
+    ("financial", "cards", "cards", ("card_type", "card_number"), "many"),
+    (None, "security", "security_info", ("passwords", "security_questions"), "one"),
+]
+
+
+def test_routes_on_schema_words():
+    router = SectionRouter(SECTIONS)
+    assert router.route("What dosage of my medications should I take?") == {"medications"}
+    assert router.route("Which card should I use?") == {"cards"}
+
+
+def test_generic_column_words_do_not_select_sections():
+    router = SectionRouter(SECTIONS)
+    assert router.route("Tell me a joke about a name and a number") == set()
+
+
+def test_group_keywords_and_always():
+    router = SectionRouter(
+        SECTIONS, group_keywords={"medical": ["sick"]}, always=["security"]
+    )
+    assert router.route("I feel sick") == {"medications", "doctor_visits", "security"}
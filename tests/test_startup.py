@@ -0,0 +1,58 @@
+# tests/test_startup.py
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds the command line client may take to import, well above the
+# lightweight imports and well below loading torch
+STARTUP_BUDGET = 1.0
+
+HEAVY_MODULES = ("torch", "transformers", "tensorflow")
+
+# Server-side modules the client has no use for
+SERVER_MODULES = (
+    "psycopg2",
+    "chat_session",
+    "prefix_cache",
+    "token_buffer",
+    "logic.model_memory_logic",
+    "logic.profile_format",
+    "logic.response_cache",
+    "logic.text_chat_logic",
+)
+
+IMPORT_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import generate_text
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES + SERVER_MODULES,)
+
+
+def test_generate_text_starts_without_heavy_or_server_imports():
+    pytest.importorskip("dotenv")
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(
+            [REPO_DIR, os.path.join(REPO_DIR, "scripts"), os.environ.get("PYTHONPATH", "")]
+        ),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CODE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    startup = json.loads(result.stdout.strip().splitlines()[-1])
+    assert startup["loaded"] == []
+    assert startup["seconds"] < STARTUP_BUDGET
@@ -0,0 +1,47 @@
+# tests/test_stopping_criteria.py
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from stopping_criteria import SentenceStopping
+
+PAD = 0
+
+
+class CharTokenizer:
+    # One token per character; token 0 is padding
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(token) for token in ids.tolist() if token != PAD)
+
+
+def batch(prompt_length, *replies):
+    width = max(len(reply) for reply in replies)
+    # Shorter replies are left-padded with spaces, which decode like text
+    return torch.tensor(
+        [[PAD] * prompt_length + [ord(char) for char in reply.rjust(width)] for reply in replies]
+    )
+
+
+def test_no_criteria_without_targets_or_stop_strings():
+    assert SentenceStopping.from_configs(CharTokenizer(), 4, [{}, {"stop_strings": []}]) is None
+
+
+def test_stops_at_a_sentence_end_after_the_target_length():
+    stopping = SentenceStopping.from_configs(
+        CharTokenizer(), 4, [{"target_new_tokens": 5}, {"target_new_tokens": 20}]
+    )
+    # Below the target a sentence end does not stop the row
+    assert stopping(batch(4, "Hi.", "Hi."), None).tolist() == [False, False]
+    assert stopping(batch(4, "Hi. Yes.", "Hi. Yes."), None).tolist() == [True, False]
+    # Past the target, but in the middle of a sentence
+    assert stopping(batch(4, "Hi. Yes and", "Hi. Yes and"), None).tolist() == [False, False]
+
+
+def test_stops_at_each_rows_own_stop_strings():
+    stopping = SentenceStopping.from_configs(
+        CharTokenizer(), 2, [{"stop_strings": ["User:"]}, {"stop_strings": ["###"]}]
+    )
+    assert stopping(batch(2, "ok User:", "ok User:"), None).tolist() == [True, False]
+    assert stopping(batch(2, "ok ###", "ok ###"), None).tolist() == [False, True]
@@ -0,0 +1,26 @@
+# tests/test_text_chat_logic.py
+
+import json
+import os
+
+from logic import text_chat_logic
+
+REPO_CONFIG = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "followup_messages.json"
+)
+
+
+def test_followups_are_loaded_on_first_use(monkeypatch):
+    monkeypatch.setattr(text_chat_logic, "FOLLOWUP_CONFIG_FILE", REPO_CONFIG)
+    monkeypatch.setattr(text_chat_logic, "_followups", None)
+    with open(REPO_CONFIG) as file:
+        config = json.load(file)
+
+    assert text_chat_logic.get_followup_message("Tell me about the Moon", "") == (
+        config["keywords"]["moon"]
+    )
+    # Keywords in the reply count when the prompt has none
+    assert text_chat_logic.get_followup_message("hi", "a python script") == (
+        config["keywords"]["python"]
+    )
+    assert text_chat_logic.get_followup_message("hi", "hello") == config["default_message"]
@@ -0,0 +1,27 @@
+# tests/test_timed_streamer.py
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from timed_streamer import TimedTextStreamer
+
+
+class CharTokenizer:
+    # One token per character
+    def decode(self, ids, **kwargs):
+        return "".join(chr(token) for token in ids)
+
+
+def test_first_token_time_is_taken_before_a_word_is_complete():
+    streamer = TimedTextStreamer(CharTokenizer(), skip_prompt=True)
+    streamer.put(torch.tensor([[ord("a")]]))
+    assert streamer.first_token_time is None
+    # Half a word: no text is released yet, but the token has arrived
+    streamer.put(torch.tensor([ord("h")]))
+    assert streamer.first_token_time is not None
+    assert not "".join(streamer.text_queue.queue)
+    streamer.put(torch.tensor([ord("i")]))
+    streamer.end()
+    assert (streamer.steps, streamer.tokens) == (2, 2)
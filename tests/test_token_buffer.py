@@ -0,0 +1,102 @@
+# tests/test_token_buffer.py
+
+import pytest
+
+pytest.importorskip("tokenizers")
+transformers = pytest.importorskip("transformers")
+
+from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+
+from token_buffer import TokenBuffer
+
+CORPUS = [
+    "User: hello there, how are you today?",
+    "Reply: I am fine. Shall we go for a walk in the park?",
+    "  indented line with the weekend plans",
+    "User Details: name=Alice, city=Oslo",
+    "expense_tracking: category=food, amount=12.5, date=2024-03-04",
+] * 20
+
+HISTORY = "User: hello there\nReply: fine.\n\nUser Details: name=Alice\n"
+
+
+def build_tokenizer(pre_tokenizer, decoder, bos=True):
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizer
+    tokenizer.decoder = decoder
+    tokenizer.train_from_iterator(
+        ["\n".join(CORPUS)],
+        trainers.BpeTrainer(
+            vocab_size=400,
+            show_progress=False,
+            special_tokens=["<unk>", "<s>"],
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    if bos:
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="<s> $A", special_tokens=[("<s>", tokenizer.token_to_id("<s>"))]
+        )
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, bos_token="<s>", unk_token="<unk>"
+    )
+
+
+def line_safe_tokenizer():
+    # Newlines are split off before byte-level BPE, so no token spans a line
+    # start and every line is pre-tokenized the same on its own
+    return build_tokenizer(
+        pre_tokenizers.Sequence(
+            [
+                pre_tokenizers.Split(Regex(r"\n+"), behavior="isolated"),
+                pre_tokenizers.ByteLevel(add_prefix_space=False),
+            ]
+        ),
+        decoders.ByteLevel(),
+    )
+
+
+def gpt2_style_tokenizer():
+    # GPT-2 pre-tokenizes "\n  x" as "\n " + " x"
+    return build_tokenizer(pre_tokenizers.ByteLevel(add_prefix_space=False), decoders.ByteLevel())
+
+
+def llama_style_tokenizer():
+    # SentencePiece-style: "▁" is put in front of every call's text
+    return build_tokenizer(
+        pre_tokenizers.Metaspace(prepend_scheme="always"), decoders.Metaspace(prepend_scheme="always")
+    )
+
+
+def test_line_safe_tokenizer_only_tokenizes_new_lines():
+    tokenizer = line_safe_tokenizer()
+    buffer = TokenBuffer()
+    first = HISTORY + "  what should I do?"
+    assert buffer.encode(tokenizer, first) == tokenizer(first).input_ids
+    assert buffer.line_safe
+
+    second = HISTORY + "  what should I do?\nReply: walk.\nand tomorrow?"
+    assert buffer.encode(tokenizer, second) == tokenizer(second).input_ids
+    # The old prompt line gained its newline, so it is a new piece as well
+    assert buffer.tokenized_chars == len("  what should I do?\nReply: walk.\nand tomorrow?")
+
+
+@pytest.mark.parametrize("build", [gpt2_style_tokenizer, llama_style_tokenizer])
+def test_tokenizers_merging_across_lines_fall_back(build):
+    tokenizer = build()
+    buffer = TokenBuffer()
+    prompts = [
+        HISTORY + "what should I do?",
+        HISTORY + "what should I do?\nReply: walk.\n  and tomorrow?",
+    ]
+    for prompt in prompts:
+        assert buffer.encode(tokenizer, prompt) == tokenizer(prompt).input_ids
+    assert buffer.line_safe is False
+
+
+def test_lines_dropped_from_the_prompt_are_forgotten():
+    tokenizer = line_safe_tokenizer()
+    buffer = TokenBuffer()
+    buffer.encode(tokenizer, "old turn\nprompt")
+    buffer.encode(tokenizer, "new turn\nprompt")
+    assert set(buffer.pieces) == {"new turn\n", "prompt"}